@@ -1,10 +1,28 @@
 import os
+import threading
+import time
+from collections import deque
 import psycopg2
+import psycopg2.extensions
 from dotenv import load_dotenv
+from pgvector.psycopg2 import register_vector
+
+from app.timing import stage
 
 load_dotenv()
 
-def get_db_connection():
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "2"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+# Connections idle longer than this are pinged with SELECT 1 before being handed out
+DB_POOL_HEALTHCHECK_IDLE = float(os.getenv("DB_POOL_HEALTHCHECK_IDLE", "30"))
+
+
+class PoolTimeout(RuntimeError):
+    """No pooled connection became free within DB_POOL_TIMEOUT seconds."""
+
+
+def get_db_config():
     config = {
         "dbname": os.getenv("DB_NAME"),
         "user": os.getenv("DB_USER"),
@@ -16,5 +34,235 @@ def get_db_connection():
     missing = [k for k, v in config.items() if not v]
     if missing:
         raise RuntimeError(f"Missing DB env vars: {', '.join(missing)}")
-    conn = psycopg2.connect(**config)
-    return conn
+    return config
+
+
+class PooledConnection:
+    """
+    Thin handle around a pooled psycopg2 connection. Everything is delegated
+    to the real connection except close(), which hands it back to the pool,
+    so routes keep their usual get_db_connection() / conn.close() pattern.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get("_conn")
+        if conn is None:
+            raise psycopg2.InterfaceError("connection already returned to the pool")
+        return getattr(conn, name)
+
+    @property
+    def closed(self):
+        return self._conn is None or self._conn.closed
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.putconn(conn)
+
+    def __del__(self):
+        # Safety net for a handle dropped without close(); callers should still
+        # close in a finally. GC can run while this thread holds a pool lock, so
+        # only queue the connection here (deque.append takes no lock) and let
+        # the next checkout return it.
+        conn = self.__dict__.get("_conn")
+        if conn is not None:
+            self._conn = None
+            self._pool._leaked.append(conn)
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool. Checkout blocks for up to `timeout` seconds when
+    every connection is in use, then raises PoolTimeout. Connections are opened
+    on demand (minconn up front) and every healthy one is kept idle on return,
+    up to maxconn, so steady traffic never reconnects.
+    """
+
+    def __init__(self, minconn, maxconn, timeout, healthcheck_idle):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self._config = get_db_config()
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._returned_at = {}
+        # connections recovered by PooledConnection.__del__, returned by getconn
+        self._leaked = deque()
+        self.in_use = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.discarded = 0
+        self.leaked = 0
+        self.wait_seconds = 0.0
+        self.vector_registered = False
+        for _ in range(minconn):
+            conn = psycopg2.connect(**self._config)
+            self._returned_at[id(conn)] = time.monotonic()
+            self._idle.append(conn)
+
+    def getconn(self):
+        self._reclaim_leaked()
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise PoolTimeout(f"No database connection available within {self.timeout}s")
+        conn = None
+        try:
+            conn = self._take_idle()
+            if conn is not None and not self._is_healthy(conn):
+                self._close(conn)
+                with self._lock:
+                    self.discarded += 1
+                conn = None
+            if conn is None:
+                conn = psycopg2.connect(**self._config)
+            if not self.vector_registered:
+                self._register_vector(conn)
+        except Exception:
+            if conn is not None:
+                self._close(conn)
+            self._slots.release()
+            raise
+        with self._lock:
+            self.in_use += 1
+            self.checkouts += 1
+            self.wait_seconds += time.perf_counter() - start
+        return PooledConnection(self, conn)
+
+    def putconn(self, conn):
+        try:
+            if self._reset(conn):
+                with self._lock:
+                    if len(self._idle) < self.maxconn:
+                        self._returned_at[id(conn)] = time.monotonic()
+                        self._idle.append(conn)
+                        conn = None
+            if conn is not None:
+                self._close(conn)
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    def _take_idle(self):
+        with self._lock:
+            # most recently returned first: it is the least likely to need a ping
+            return self._idle.pop() if self._idle else None
+
+    def _reset(self, conn):
+        """rolls back anything left open; False if the connection is unusable"""
+        if conn.closed:
+            return False
+        status = conn.info.transaction_status
+        if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                return False
+        return True
+
+    def _close(self, conn):
+        # forget its id() too: a new connection may be allocated at the same address
+        self._returned_at.pop(id(conn), None)
+        if not conn.closed:
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
+
+    def _reclaim_leaked(self):
+        while True:
+            try:
+                conn = self._leaked.popleft()
+            except IndexError:
+                return
+            with self._lock:
+                self.leaked += 1
+            self.putconn(conn)
+
+    def _register_vector(self, conn):
+        # pgvector adapter: numpy arrays bind as vector parameters. The type OIDs
+        # are the same on every connection to this database, so one global
+        # registration covers the whole pool. Retried on later checkouts if the
+        # extension is not installed yet.
+        try:
+            register_vector(conn, globally=True)
+            self.vector_registered = True
+        except psycopg2.ProgrammingError as e:
+            print(f"ERROR registering pgvector types: {e}")
+        finally:
+            conn.rollback()
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        returned_at = self._returned_at.get(id(conn))
+        if returned_at is not None and time.monotonic() - returned_at < self.healthcheck_idle:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "in_use": self.in_use,
+                "idle": len(self._idle),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "discarded": self.discarded,
+                "leaked": self.leaked,
+                "avg_wait_ms": round(1000 * self.wait_seconds / self.checkouts, 3) if self.checkouts else 0.0,
+            }
+
+    def closeall(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._close(conn)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def init_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_HEALTHCHECK_IDLE)
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+def pool_stats():
+    return _pool.stats() if _pool is not None else None
+
+
+def get_db_connection():
+    pool = _pool or init_pool()
+    with stage("db_checkout"):
+        return pool.getconn()
@@ -0,0 +1,283 @@
+import os
+import threading
+import time
+import numpy as np
+
+from app.db import get_db_connection
+from app.face.scan import FACE_EMBEDDING_SIZE
+
+FACE_GALLERY_ENABLED = os.getenv("FACE_GALLERY_ENABLED", "0") == "1"
+# Other workers enroll/delete faces too; re-check FACE_IMAGE this often (0 disables)
+FACE_GALLERY_RELOAD_SECONDS = float(os.getenv("FACE_GALLERY_RELOAD_SECONDS", "30"))
+# Gallery matrix storage: "float32", "float16" (half the memory) or "int8" (a quarter,
+# plus one scale per row). Quantized galleries only pick candidates; the route
+# reranks FACE_RERANK_CANDIDATES of them against the full-precision FACE_IMAGE rows.
+FACE_GALLERY_DTYPE = os.getenv("FACE_GALLERY_DTYPE", "float32").lower()
+# Quantized rows are upcast to float32 this many at a time so scoring still uses BLAS
+GALLERY_SCORE_CHUNK = int(os.getenv("GALLERY_SCORE_CHUNK", "8192"))
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _parse_vector(text):
+    # pgvector text form: "[0.1,0.2,...]"
+    return np.array(text[1:-1].split(","), dtype=np.float32)
+
+
+class EmbeddingRows:
+    """
+    L2-normalized embedding rows stored as float32, float16 or int8. int8 rows
+    are symmetric per-row quantized: row ~= data * scale, scale = max|x| / 127.
+    """
+
+    def __init__(self, data, scales=None):
+        self.data = data
+        self.scales = scales
+
+    @classmethod
+    def quantize(cls, matrix, dtype):
+        matrix = np.asarray(matrix, dtype=np.float32).reshape(-1, FACE_EMBEDDING_SIZE)
+        if dtype == "float32":
+            return cls(np.ascontiguousarray(matrix))
+        if dtype == "float16":
+            return cls(np.ascontiguousarray(matrix.astype(np.float16)))
+        if dtype == "int8":
+            scales = np.abs(matrix).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            data = np.rint(matrix / scales[:, None]).astype(np.int8)
+            return cls(np.ascontiguousarray(data), scales.astype(np.float32))
+        raise ValueError(f"Unknown FACE_GALLERY_DTYPE '{dtype}' (expected float32, float16 or int8)")
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def take(self, rows):
+        scales = self.scales[rows] if self.scales is not None else None
+        return EmbeddingRows(np.ascontiguousarray(self.data[rows]), scales)
+
+    def append(self, other):
+        scales = np.append(self.scales, other.scales) if self.scales is not None else None
+        return EmbeddingRows(np.ascontiguousarray(np.vstack([self.data, other.data])), scales)
+
+    def similarities(self, queries):
+        """cosine similarity of each normalized float32 query to every row"""
+        if self.data.dtype == np.float32:
+            return queries @ self.data.T
+        sims = np.empty((len(queries), len(self.data)), dtype=np.float32)
+        for start in range(0, len(self.data), GALLERY_SCORE_CHUNK):
+            chunk = self.data[start:start + GALLERY_SCORE_CHUNK].astype(np.float32)
+            sims[:, start:start + len(chunk)] = queries @ chunk.T
+        if self.scales is not None:
+            sims *= self.scales
+        return sims
+
+
+class EmbeddingGallery:
+    """
+    In-process copy of FACE_IMAGE as one contiguous matrix of L2-normalized
+    rows (float32, or float16 / int8 per FACE_GALLERY_DTYPE), so a cosine
+    top-k is a single matrix-vector product.
+    Each row also carries its ceremony (FACE_IMAGE -> STUDENT -> DEGREE), and
+    per-ceremony sub-matrices are cut lazily for scoped searches.
+
+    Readers take an immutable snapshot; writers build new arrays and swap the
+    snapshot under a lock, so searches never block on enrollments.
+    """
+
+    # Detects enrollments, deletions and degree/ceremony reassignments made
+    # by other workers without pulling the embeddings themselves.
+    SIGNATURE_SQL = """
+        SELECT COUNT(*), MAX(f.face_id),
+               md5(string_agg(f.face_id || ':' || COALESCE(d.ceremony_id, 0), ',' ORDER BY f.face_id))
+        FROM FACE_IMAGE f
+        LEFT JOIN STUDENT s ON s.PID = f.SPID
+        LEFT JOIN DEGREE d ON d.degree_name = s.degree_name
+    """
+
+    def __init__(self, dtype=FACE_GALLERY_DTYPE):
+        self.dtype = dtype
+        self._lock = threading.Lock()
+        self._snapshot = (
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=object),
+            np.empty(0, dtype=np.int64),
+            EmbeddingRows.quantize(np.empty((0, FACE_EMBEDDING_SIZE)), dtype),
+        )
+        self._partitions = {}
+        self._signature = None
+        self.ready = False
+        self.load_seconds = None
+
+    def __len__(self):
+        return len(self._snapshot[0])
+
+    @property
+    def quantized(self):
+        # distances from a quantized gallery are approximate; rerank before trusting them
+        return self.dtype != "float32"
+
+    def _swap(self, snapshot):
+        # caller holds self._lock; _partition reads these in the opposite order
+        self._snapshot = snapshot
+        self._partitions = {}
+
+    def load(self, conn=None):
+        own_conn = conn is None
+        conn = conn or get_db_connection()
+        try:
+            cur = conn.cursor()
+            start = time.perf_counter()
+            cur.execute(self.SIGNATURE_SQL)
+            signature = cur.fetchone()
+            cur.execute(
+                """
+                SELECT f.face_id, f.SPID, COALESCE(d.ceremony_id, 0), f.embedding::text
+                FROM FACE_IMAGE f
+                LEFT JOIN STUDENT s ON s.PID = f.SPID
+                LEFT JOIN DEGREE d ON d.degree_name = s.degree_name
+                ORDER BY f.face_id
+                """
+            )
+            rows = cur.fetchall()
+            cur.close()
+            conn.commit()
+        finally:
+            if own_conn:
+                conn.close()
+
+        face_ids = np.array([r[0] for r in rows], dtype=np.int64)
+        spids = np.array([r[1] for r in rows], dtype=object)
+        ceremony_ids = np.array([r[2] for r in rows], dtype=np.int64)
+        matrix = np.empty((len(rows), FACE_EMBEDDING_SIZE), dtype=np.float32)
+        for i, r in enumerate(rows):
+            matrix[i] = _parse_vector(r[3])
+        matrix = EmbeddingRows.quantize(_normalize(matrix), self.dtype)
+
+        with self._lock:
+            self._swap((face_ids, spids, ceremony_ids, matrix))
+            self._signature = tuple(signature)
+            self.ready = True
+            self.load_seconds = round(time.perf_counter() - start, 3)
+
+    def is_stale(self):
+        conn = get_db_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute(self.SIGNATURE_SQL)
+            signature = tuple(cur.fetchone())
+            cur.close()
+            conn.commit()
+        finally:
+            conn.close()
+        return signature != self._signature
+
+    def add(self, face_id, spid, ceremony_id, embedding):
+        row = EmbeddingRows.quantize(_normalize(np.asarray(embedding, dtype=np.float32).reshape(1, -1)), self.dtype)
+        with self._lock:
+            face_ids, spids, ceremony_ids, matrix = self._snapshot
+            self._swap((
+                np.append(face_ids, face_id),
+                np.append(spids, np.array([spid], dtype=object)),
+                np.append(ceremony_ids, ceremony_id or 0),
+                matrix.append(row),
+            ))
+            # searchable right away; the next staleness check resyncs the signature
+            self._signature = None
+
+    def remove_student(self, spid):
+        with self._lock:
+            face_ids, spids, ceremony_ids, matrix = self._snapshot
+            keep = spids != spid
+            if keep.all():
+                return
+            self._swap((face_ids[keep], spids[keep], ceremony_ids[keep], matrix.take(keep)))
+            self._signature = None
+
+    def _partition(self, ceremony_id):
+        partitions = self._partitions
+        snapshot = self._snapshot
+        if ceremony_id is None:
+            return snapshot[0], snapshot[1], snapshot[3]
+        part = partitions.get(ceremony_id)
+        if part is None:
+            face_ids, spids, ceremony_ids, matrix = snapshot
+            rows = np.flatnonzero(ceremony_ids == ceremony_id)
+            part = (face_ids[rows], spids[rows], matrix.take(rows))
+            partitions[ceremony_id] = part
+        return part
+
+    def search_many(self, embeddings, k=1, ceremony_id=None):
+        """
+        embeddings: (n, 512) array-like. Returns, per query, up to k
+        (face_id, SPID, cosine_distance) tuples ordered nearest first,
+        optionally restricted to one ceremony's graduates.
+        """
+        face_ids, spids, matrix = self._partition(ceremony_id)
+        if not len(face_ids):
+            return [[] for _ in range(len(embeddings))]
+
+        queries = _normalize(np.asarray(embeddings, dtype=np.float32).reshape(-1, FACE_EMBEDDING_SIZE))
+        sims = matrix.similarities(queries)
+        k = min(k, sims.shape[1])
+        if k < sims.shape[1]:
+            top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(k), (sims.shape[0], k))
+        order = np.take_along_axis(sims, top, axis=1).argsort(axis=1)[:, ::-1]
+        top = np.take_along_axis(top, order, axis=1)
+
+        return [
+            [(int(face_ids[j]), spids[j], float(1.0 - sims[q, j])) for j in top[q]]
+            for q in range(sims.shape[0])
+        ]
+
+    def search(self, embedding, k=1, ceremony_id=None):
+        return self.search_many([embedding], k, ceremony_id)[0]
+
+    def stats(self):
+        return {
+            "enabled": FACE_GALLERY_ENABLED,
+            "ready": self.ready,
+            "faces": len(self),
+            "dtype": self.dtype,
+            "bytes": self._snapshot[3].nbytes,
+            "load_seconds": self.load_seconds,
+        }
+
+
+gallery = EmbeddingGallery()
+
+
+def _reload_loop():
+    while True:
+        time.sleep(FACE_GALLERY_RELOAD_SECONDS)
+        try:
+            if gallery.is_stale():
+                gallery.load()
+        except Exception as e:
+            print(f"ERROR reloading face gallery: {e}")
+
+
+def start_gallery():
+    """Loads the gallery and keeps it in step with FACE_IMAGE (called from the app lifespan)."""
+    if not FACE_GALLERY_ENABLED:
+        return
+    try:
+        gallery.load()
+    except Exception as e:
+        # get_match keeps using pgvector until a reload succeeds
+        print(f"ERROR loading face gallery: {e}")
+    if FACE_GALLERY_RELOAD_SECONDS > 0:
+        threading.Thread(target=_reload_loop, name="face-gallery-reload", daemon=True).start()
+
+
+def gallery_ready():
+    return FACE_GALLERY_ENABLED and gallery.ready
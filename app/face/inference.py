@@ -0,0 +1,116 @@
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, CancelledError, TimeoutError as FuturesTimeout
+
+from app.timing import record
+
+# Face detection / recognition runs here instead of on the request threads.
+# onnxruntime releases the GIL and already spreads each session over several
+# cores, so a couple of workers is enough to keep the CPU busy.
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+# Jobs allowed to wait for a worker; beyond this new requests get a 503
+INFERENCE_QUEUE_MAX = int(os.getenv("INFERENCE_QUEUE_MAX", "8"))
+# Seconds a request waits for its result, queueing included
+INFERENCE_DEADLINE = float(os.getenv("INFERENCE_DEADLINE", "10"))
+
+
+class InferenceBusy(RuntimeError):
+    """The inference queue is full, or a job missed its deadline."""
+
+
+class InferenceExecutor:
+    """
+    Bounded thread pool for face model calls. At most workers + queue_max
+    jobs are admitted at a time, so an enrollment spike holds only that many
+    request threads and the rest of the API keeps its threadpool. A job still
+    queued when its deadline passes is dropped without running.
+    """
+
+    def __init__(self, workers, queue_max, deadline):
+        self.workers = workers
+        self.queue_max = queue_max
+        self.deadline = deadline
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="face-inference")
+        self._slots = threading.BoundedSemaphore(workers + queue_max)
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def run(self, fn, *args, timeout=None, **kwargs):
+        """
+        Runs fn(*args, **kwargs) on an inference worker and returns its result.
+        Raises InferenceBusy when saturated or after `timeout` seconds
+        (default INFERENCE_DEADLINE).
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise InferenceBusy("Face analysis is busy, try again shortly")
+        with self._lock:
+            self.admitted += 1
+
+        submitted = time.monotonic()
+        deadline = submitted + (timeout or self.deadline)
+        # run in the caller's context so the job's stages land in its Server-Timing
+        context = contextvars.copy_context()
+        try:
+            future = self._pool.submit(context.run, self._call, submitted, deadline, fn, args, kwargs)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+
+        try:
+            return future.result(timeout=max(deadline - time.monotonic(), 0))
+        except (FuturesTimeout, CancelledError):
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise InferenceBusy("Face analysis timed out")
+
+    def _call(self, submitted, deadline, fn, args, kwargs):
+        now = time.monotonic()
+        record("inference_queue", now - submitted)
+        if now > deadline:
+            # the caller has already given up on this one
+            raise CancelledError()
+        with self._lock:
+            self.running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    def _release(self):
+        with self._lock:
+            self.admitted -= 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_max": self.queue_max,
+                "running": self.running,
+                "queued": self.admitted - self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+inference = InferenceExecutor(INFERENCE_WORKERS, INFERENCE_QUEUE_MAX, INFERENCE_DEADLINE)
+
+
+def run_inference(fn, *args, **kwargs):
+    return inference.run(fn, *args, **kwargs)
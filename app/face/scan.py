@@ -4,40 +4,115 @@ from app.schemas import StudentIn
 import uuid
 import base64
 import os
+import threading
+import time
 import insightface
+from insightface.utils import face_align
 import cv2
 import numpy as np
 
+from app.timing import stage
+
 FACE_IMAGE_DIR = os.path.join(os.path.dirname(__file__), "../images/faces")
 FACE_EMBEDDING_SIZE = 512
 
+FACE_MODEL_NAME = os.getenv("FACE_MODEL_NAME", "buffalo_l")
+FACE_CTX_ID = int(os.getenv("FACE_CTX_ID", "0"))
+FACE_DET_SIZE = int(os.getenv("FACE_DET_SIZE", "640"))
+# Detector input for kiosk face crops (CameraCapture kiosk mode): the face already
+# fills most of the frame, so a much smaller input still finds its landmarks.
+# Must be a multiple of 32; 0 runs crops through the full-size detector.
+FACE_CROP_DET_SIZE = int(os.getenv("FACE_CROP_DET_SIZE", "160"))
+
+# One FaceAnalysis per worker process, shared by every request thread.
+# onnxruntime sessions are safe to run concurrently; only loading needs the lock.
+_model = None
+_model_lock = threading.Lock()
+_model_status = {
+    "ready": False,
+    "warmed_up": False,
+    "load_seconds": None,
+    "warmup_seconds": None,
+    "error": None,
+}
+
 def store_face(student: StudentIn) -> str:
     """
     stores student face image and returns the storage URI
     """
     header, encoded = student.photo.split(",", 1)
     file_ext = header.split(";")[0].split("/")[1]
-    file_name = f"{student.PID}_{uuid.uuid4()}.{file_ext}"
+    return store_face_bytes(student.PID, base64.b64decode(encoded), file_ext)
+
+def store_face_bytes(pid: str, image_bytes: bytes, file_ext: str) -> str:
+    """
+    stores already-decoded face image bytes and returns the storage URI
+    """
+    file_name = f"{pid}_{uuid.uuid4()}.{file_ext}"
     storage_path = os.path.join(FACE_IMAGE_DIR, file_name)
-    image_bytes = base64.b64decode(encoded)
-    
-    with open(storage_path, "wb") as f:
+
+    with stage("store_face"), open(storage_path, "wb") as f:
         f.write(image_bytes)
 
     return file_name
 
-def get_embedding(image_input):
+def get_model():
+    """
+    returns the process-wide FaceAnalysis model, loading it on first use
+    """
+    global _model
+    if _model is None:
+        # includes waiting for the warm-up thread that is already loading it
+        with stage("model_load"), _model_lock:
+            if _model is None:
+                start = time.perf_counter()
+                try:
+                    model = insightface.app.FaceAnalysis(name=FACE_MODEL_NAME)
+                    model.prepare(ctx_id=FACE_CTX_ID, det_size=(FACE_DET_SIZE, FACE_DET_SIZE))
+                except Exception as e:
+                    _model_status["error"] = str(e)
+                    raise
+                _model_status["load_seconds"] = round(time.perf_counter() - start, 3)
+                _model_status["ready"] = True
+                _model_status["error"] = None
+                _model = model
+    return _model
+
+def warm_up_model():
+    """
+    loads the model and runs one dummy pass through the detector and the
+    recognizer so the first real request does not pay for session setup
+    """
+    try:
+        model = get_model()
+        start = time.perf_counter()
+        model.get(np.zeros((FACE_DET_SIZE, FACE_DET_SIZE, 3), dtype=np.uint8))
+        if FACE_CROP_DET_SIZE:
+            size = (FACE_CROP_DET_SIZE, FACE_CROP_DET_SIZE)
+            model.det_model.detect(np.zeros(size + (3,), dtype=np.uint8), input_size=size)
+        recognizer = model.models.get("recognition")
+        if recognizer is not None:
+            size = recognizer.input_size[0]
+            recognizer.get_feat(np.zeros((size, size, 3), dtype=np.uint8))
+        _model_status["warmup_seconds"] = round(time.perf_counter() - start, 3)
+        _model_status["warmed_up"] = True
+    except Exception as e:
+        _model_status["error"] = str(e)
+        print(f"ERROR warming up face model: {e}")
+
+def model_status() -> dict:
+    return dict(_model_status, name=FACE_MODEL_NAME)
+
+def get_embedding(image_input, det_size=None):
     """
     Accepts either:
     - a filename (str) relative to FACE_IMAGE_DIR
     - a cv2/numpy image (np.ndarray)
 
-    Returns a 512-dim embedding list
+    det_size overrides the detector input size (e.g. FACE_CROP_DET_SIZE for
+    kiosk face crops). Returns a 512-dim embedding list
     """
 
-    model = insightface.app.FaceAnalysis()
-    model.prepare(ctx_id=0)
-
     # If it's a string, treat as a filename
     if isinstance(image_input, str):
         storage_path = os.path.join(FACE_IMAGE_DIR, image_input)
@@ -53,26 +128,64 @@ def get_embedding(image_input):
     else:
         raise TypeError("Input must be a filename (str) or a cv2 image (np.ndarray)")
 
-    faces = model.get(image)
-    if not faces:
+    # Same face and embedding FaceAnalysis.get would return, without running
+    # its landmark / gender-age models, and with detection and recognition
+    # timed as separate stages
+    embedding = get_embeddings([image], det_size)[0]
+    if embedding is None:
         raise ValueError("No face detected in image")
 
-    embedding = faces[0]['embedding'].tolist()
-
     if len(embedding) != FACE_EMBEDDING_SIZE:
         raise ValueError(f"Embedding size mismatch: expected {FACE_EMBEDDING_SIZE}, got {len(embedding)}")
 
     return embedding
 
+def get_embeddings(images: list, det_size=None) -> list:
+    """
+    Batched variant of get_embedding for already-decoded cv2 images.
+
+    Detection runs per image, but every aligned face crop goes through the
+    recognizer in a single inference call. Returns one 512-dim embedding list
+    per input image, or None where no face was detected.
+    """
+    model = get_model()
+    recognizer = model.models["recognition"]
+    crop_size = recognizer.input_size[0]
+    input_size = (det_size, det_size) if det_size else None
+
+    crops, owners = [], []
+    with stage("detect"):
+        for i, image in enumerate(images):
+            bboxes, kpss = model.det_model.detect(image, input_size=input_size, max_num=0, metric="default")
+            if bboxes.shape[0] == 0 or kpss is None:
+                continue
+            # same face FaceAnalysis.get would list first
+            crops.append(face_align.norm_crop(image, landmark=kpss[0], image_size=crop_size))
+            owners.append(i)
+
+    embeddings = [None] * len(images)
+    if crops:
+        with stage("recognize"):
+            feats = recognizer.get_feat(crops)
+        for i, feat in zip(owners, feats):
+            embeddings[i] = feat.tolist()
+    return embeddings
+
 def base64_to_cv2(base64_str: str):
-    # Remove data:image/...;base64, header if present
-    if "," in base64_str:
-        base64_str = base64_str.split(",", 1)[1]
+    with stage("decode"):
+        # Remove data:image/...;base64, header if present
+        if "," in base64_str:
+            base64_str = base64_str.split(",", 1)[1]
 
-    # Decode base64 to bytes
-    image_bytes = base64.b64decode(base64_str)
+        # Decode base64 to bytes
+        return _imdecode(base64.b64decode(base64_str))
 
-    # Convert bytes to numpy array
+def bytes_to_cv2(image_bytes: bytes):
+    with stage("decode"):
+        return _imdecode(image_bytes)
+
+def _imdecode(image_bytes: bytes):
+    # View the encoded bytes as a numpy array (no copy)
     np_arr = np.frombuffer(image_bytes, np.uint8)
 
     # Decode to OpenCV image
@@ -82,5 +195,3 @@ def base64_to_cv2(base64_str: str):
         raise ValueError("Could not decode image")
 
     return image
-
-    
@@ -0,0 +1,157 @@
+import os
+
+# Deployment-wide defaults for the FACE_IMAGE ANN index; MatchIn can override per request.
+# Unset means "use the pgvector default" (hnsw.ef_search = 40, ivfflat.probes = 1).
+FACE_INDEX_EF_SEARCH = os.getenv("FACE_INDEX_EF_SEARCH")
+FACE_INDEX_PROBES = os.getenv("FACE_INDEX_PROBES")
+# pgvector >= 0.8 only: keep scanning the index until a ceremony filter has enough
+# rows ("relaxed_order" / "strict_order"). Unset leaves the server default.
+FACE_INDEX_ITERATIVE_SCAN = os.getenv("FACE_INDEX_ITERATIVE_SCAN")
+# Must match the index scripts/createDB.py built. "halfvec" searches a half-precision
+# expression index on FACE_IMAGE.embedding (half the size of the float32 one) and
+# reranks the nearest FACE_RERANK_CANDIDATES rows by their full-precision distance.
+FACE_INDEX_PRECISION = os.getenv("FACE_INDEX_PRECISION", "vector").lower()
+# Rows pulled from a halfvec index (or an int8/float16 gallery) for the exact rerank.
+# HNSW returns at most hnsw.ef_search rows, so keep FACE_INDEX_EF_SEARCH >= this.
+FACE_RERANK_CANDIDATES = int(os.getenv("FACE_RERANK_CANDIDATES", "40"))
+FACE_HALFVEC_TYPE = "halfvec(512)"  # same expression as the index in scripts/createDB.py
+
+# Graduates of one ceremony only; %(ceremony_id)s NULL means everyone
+CEREMONY_FILTER = """
+    %(ceremony_id)s::int IS NULL OR f.SPID IN (
+        SELECT cs.PID
+        FROM STUDENT cs
+        JOIN DEGREE d ON d.degree_name = cs.degree_name
+        WHERE d.ceremony_id = %(ceremony_id)s
+    )
+"""
+
+
+def nearest_faces_sql(query, precision=None):
+    """
+    SQL for the nearest FACE_IMAGE rows to `query` (an SQL expression of type
+    vector) as (face_id, SPID, distance), nearest first, using the
+    FACE_INDEX_PRECISION index. Takes %(ceremony_id)s, %(limit)s and
+    %(candidates)s; see search_params. Distances are always full precision.
+    """
+    if (precision or FACE_INDEX_PRECISION) == "halfvec":
+        return f"""
+            SELECT c.face_id, c.SPID, c.embedding <=> {query} AS distance
+            FROM (
+                SELECT f.face_id, f.SPID, f.embedding
+                FROM FACE_IMAGE f
+                WHERE {CEREMONY_FILTER}
+                ORDER BY f.embedding::{FACE_HALFVEC_TYPE} <=> ({query})::{FACE_HALFVEC_TYPE}
+                LIMIT %(candidates)s
+            ) c
+            ORDER BY distance
+            LIMIT %(limit)s
+        """
+    return f"""
+        SELECT f.face_id, f.SPID, f.embedding <=> {query} AS distance
+        FROM FACE_IMAGE f
+        WHERE {CEREMONY_FILTER}
+        ORDER BY distance
+        LIMIT %(limit)s
+    """
+
+
+def search_params(ceremony_id, limit, **params):
+    return dict(params, ceremony_id=ceremony_id, limit=limit, candidates=max(FACE_RERANK_CANDIDATES, limit))
+
+
+# Full-precision distances (and STUDENT rows) for gallery candidates: one
+# (query index, face_id) pair per candidate, queries bound as a vector[].
+RERANK_SQL = """
+    SELECT q.idx, s.PID, s.name, s.email, s.degree_name, s.degree_type, s.opt_in_biometric,
+           f.embedding <=> q.emb AS distance
+    FROM unnest(%(idx)s::int[], %(embeddings)s::vector[]) AS q(idx, emb)
+    JOIN unnest(%(candidate_idx)s::int[], %(candidate_face_ids)s::int[]) AS c(idx, face_id) ON c.idx = q.idx
+    JOIN FACE_IMAGE f ON f.face_id = c.face_id
+    JOIN STUDENT s ON s.PID = f.SPID
+    ORDER BY q.idx, distance
+"""
+
+
+def apply_search_params(cur, ef_search=None, probes=None, filtered=False):
+    """
+    sets the HNSW / IVFFlat recall knobs for the current transaction only,
+    so a pooled or reused connection never leaks them into the next request
+    """
+    ef_search = ef_search or FACE_INDEX_EF_SEARCH
+    probes = probes or FACE_INDEX_PROBES
+    if ef_search:
+        cur.execute("SELECT set_config('hnsw.ef_search', %s, true)", (str(int(ef_search)),))
+    if probes:
+        cur.execute("SELECT set_config('ivfflat.probes', %s, true)", (str(int(probes)),))
+    if filtered and FACE_INDEX_ITERATIVE_SCAN:
+        cur.execute("SELECT set_config('hnsw.iterative_scan', %s, true)", (FACE_INDEX_ITERATIVE_SCAN,))
+        cur.execute("SELECT set_config('ivfflat.iterative_scan', %s, true)", (FACE_INDEX_ITERATIVE_SCAN,))
+
+# Match acceptance. The nearest student is only accepted when their cosine
+# distance is at most MATCH_MAX_DISTANCE and the runner-up student is at least
+# MATCH_MIN_MARGIN further away; otherwise the kiosk gets "no_match" or
+# "ambiguous" and the operator decides. Tune against face_match_distance on /metrics.
+MATCH_MAX_DISTANCE = float(os.getenv("MATCH_MAX_DISTANCE", "0.6"))
+MATCH_MIN_MARGIN = float(os.getenv("MATCH_MIN_MARGIN", "0.05"))
+# Candidates returned per match (MatchIn.top_k overrides, up to MATCH_TOP_K_MAX)
+MATCH_TOP_K = int(os.getenv("MATCH_TOP_K", "3"))
+MATCH_TOP_K_MAX = int(os.getenv("MATCH_TOP_K_MAX", "10"))
+# FACE_IMAGE rows fetched per student wanted. Students with more enrolled faces
+# than this can crowd the runner-up out of the window; see nearest_students.
+MATCH_FACES_PER_STUDENT = int(os.getenv("MATCH_FACES_PER_STUDENT", "5"))
+
+
+def faces_to_fetch(top_k):
+    # a student can have several FACE_IMAGE rows; over-fetch so k distinct students
+    # survive, and always look at a runner-up so the margin can be checked
+    return max(top_k, 2) * MATCH_FACES_PER_STUDENT
+
+
+def nearest_students(faces, top_k, fetched):
+    """
+    faces: (SPID, distance) pairs, nearest first, from a search limited to
+    `fetched` rows. Returns (students, runner_up_floor): up to max(top_k, 2)
+    (SPID, distance) pairs keeping each student's closest face, and when a
+    full window held only one student, the distance of the furthest face in
+    it (the runner-up is at least that far, but unknown); otherwise None.
+    """
+    seen, nearest = set(), []
+    for spid, distance in faces:
+        if spid not in seen:
+            seen.add(spid)
+            nearest.append((spid, distance))
+            if len(nearest) == max(top_k, 2):
+                break
+    runner_up_floor = faces[-1][1] if len(nearest) == 1 and len(faces) >= fetched else None
+    return nearest, runner_up_floor
+
+
+def match_outcome(candidates, top_k, runner_up_floor=None):
+    """
+    candidates: (student dict, distance) pairs, nearest first, one per student.
+    Returns the match result: status "match" (with `student` set), "no_match"
+    or "ambiguous", the best distance, and the nearest top_k candidates.
+    With a single candidate, runner_up_floor (see nearest_students) stands in
+    for the runner-up: a match needs the margin to hold against it too.
+    """
+    if not candidates:
+        status = "no_match"
+    elif candidates[0][1] > MATCH_MAX_DISTANCE:
+        status = "no_match"
+    elif len(candidates) > 1:
+        margin_ok = candidates[1][1] - candidates[0][1] >= MATCH_MIN_MARGIN
+        status = "match" if margin_ok else "ambiguous"
+    elif runner_up_floor is not None and runner_up_floor - candidates[0][1] < MATCH_MIN_MARGIN:
+        # runner-up pushed out of the window by this student's own faces
+        status = "ambiguous"
+    else:
+        status = "match"
+    # an ambiguous result always shows the runner-up it was confused with, when known
+    shown = candidates[:max(top_k, 2)] if status == "ambiguous" else candidates[:top_k]
+    return {
+        "status": status,
+        "student": candidates[0][0] if status == "match" else None,
+        "distance": candidates[0][1] if candidates else None,
+        "candidates": [{"student": s, "distance": d} for s, d in shown],
+    }
@@ -1,4 +1,7 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import threading
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.routes import students as students_routes
@@ -8,12 +11,43 @@ from app.routes import queue as queue_routes
 from app.routes import staff as staff_routes
 from app.routes import auth as auth_routes   # NEW
 from app.routes import reports as reports_routes
+from app.face.scan import warm_up_model, model_status
+from app.db import init_pool, close_pool, pool_stats, PoolTimeout
+from app.face.inference import inference, InferenceBusy
+from app.face.gallery import start_gallery, gallery
+from app.routes.reports import start_render_pool, shutdown_render_pool
+from app.report_cache import start_summary_refresh
+from app.timing import ServerTimingMiddleware
+from app.metrics import MetricsMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 import os
 
-app = FastAPI(title="Commencement DB Admin")
+FACE_MODEL_WARMUP = os.getenv("FACE_MODEL_WARMUP", "1") == "1"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load + warm the face model off the event loop so /health answers while it loads
+    if FACE_MODEL_WARMUP:
+        threading.Thread(target=warm_up_model, name="face-model-warmup", daemon=True).start()
+    try:
+        init_pool()
+    except Exception as e:
+        # Keep serving; get_db_connection() retries the pool on first use
+        print(f"ERROR opening DB pool: {e}")
+    threading.Thread(target=start_gallery, name="face-gallery-load", daemon=True).start()
+    start_render_pool()
+    start_summary_refresh()
+    yield
+    shutdown_render_pool()
+    inference.shutdown()
+    close_pool()
+
+
+app = FastAPI(title="Commencement DB Admin", lifespan=lifespan)
 
 frontend_path = os.path.join(os.path.dirname(__file__), "../frontend/dist")
 
@@ -24,6 +58,16 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(PoolTimeout)
+def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+@app.exception_handler(InferenceBusy)
+def inference_busy_handler(request: Request, exc: InferenceBusy):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "2"})
 
 app.include_router(students_routes.router)
 app.include_router(ceremonies_routes.router)
@@ -35,6 +79,17 @@ app.include_router(reports_routes.router)
 
 @app.get("/health")
 def root():
-    return {"message": "FastAPI backend is running"}
+    return {
+        "message": "FastAPI backend is running",
+        "face_model": model_status(),
+        "db_pool": pool_stats(),
+        "face_gallery": gallery.stats(),
+        "inference": inference.stats(),
+    }
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus text format; sync so the queue-length query runs off the event loop
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 app.mount("/", StaticFiles(directory=frontend_path, html=True), name="frontend")
@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+
+import psycopg2
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from app.db import get_db_connection, pool_stats, PoolTimeout
+from app.face.inference import inference
+from app.face.gallery import gallery
+
+# Prometheus metrics served at GET /metrics. Request metrics are recorded by
+# MetricsMiddleware; pool, inference, gallery and queue figures are read when
+# scraped. Everything is per process, like the /health stats.
+
+# Seconds a scrape reuses the per-ceremony queue counts before querying again
+METRICS_QUEUE_TTL = float(os.getenv("METRICS_QUEUE_TTL", "5"))
+
+REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by route template and status code",
+    ["method", "route", "status"],
+)
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served")
+MATCH_DISTANCE = Histogram(
+    "face_match_distance",
+    "Cosine distance from a probe face to its nearest enrolled face",
+    ["source"],
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.2, 1.5),
+)
+MATCH_OUTCOMES = Counter("face_match_outcomes_total", "Match results by status (match / no_match / ambiguous)", ["status"])
+
+
+def _route_label(scope):
+    # the template (/api/students/{pid}), never the raw path, to keep labels bounded
+    route = scope.get("route")
+    return getattr(route, "path", None) or "other"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting requests, in-flight requests and latency per route.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            IN_FLIGHT.dec()
+            method, route = scope["method"], _route_label(scope)
+            REQUEST_SECONDS.labels(method, route).observe(time.perf_counter() - start)
+            REQUESTS.labels(method, route, str(status[0])).inc()
+
+
+class AppCollector:
+    """
+    Reads the DB pool, inference executor, face gallery and queue lengths at
+    scrape time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue_counts = []
+        self._queue_read_at = None
+
+    def describe(self):
+        # without this, registering the collector would run collect() (and its query) at import
+        return []
+
+    def collect(self):
+        pool = pool_stats()
+        if pool is not None:
+            connections = GaugeMetricFamily("db_pool_connections", "Pooled DB connections by state", labels=["state"])
+            connections.add_metric(["in_use"], pool["in_use"])
+            connections.add_metric(["idle"], pool["idle"])
+            yield connections
+            yield GaugeMetricFamily("db_pool_max_connections", "DB pool size limit", value=pool["max"])
+            yield CounterMetricFamily("db_pool_checkouts", "DB connections handed out", value=pool["checkouts"])
+            yield CounterMetricFamily("db_pool_timeouts", "DB checkouts that gave up waiting", value=pool["timeouts"])
+
+        stats = inference.stats()
+        yield GaugeMetricFamily("inference_running", "Face model jobs running", value=stats["running"])
+        yield GaugeMetricFamily("inference_queued", "Face model jobs waiting for a worker", value=stats["queued"])
+        yield GaugeMetricFamily("inference_queue_max", "Face model jobs allowed to wait", value=stats["queue_max"])
+        yield CounterMetricFamily("inference_completed", "Face model jobs finished", value=stats["completed"])
+        yield CounterMetricFamily("inference_rejected", "Face model jobs refused with 503", value=stats["rejected"])
+        yield CounterMetricFamily("inference_timeouts", "Face model jobs that missed their deadline", value=stats["timeouts"])
+
+        yield GaugeMetricFamily("face_gallery_faces", "Embeddings held in the in-process gallery", value=len(gallery))
+        yield GaugeMetricFamily("face_gallery_bytes", "Memory held by the gallery matrix (FACE_GALLERY_DTYPE)", value=gallery.stats()["bytes"])
+
+        queued = GaugeMetricFamily("queue_entries", "QUEUED rows per ceremony and status", labels=["ceremony_id", "status"])
+        for ceremony_id, status, count in self._read_queue_counts():
+            queued.add_metric([str(ceremony_id), status], count)
+        yield queued
+
+    def _read_queue_counts(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._queue_read_at is not None and now - self._queue_read_at < METRICS_QUEUE_TTL:
+                return self._queue_counts
+            try:
+                conn = get_db_connection()
+            except (PoolTimeout, psycopg2.Error, RuntimeError) as e:
+                print(f"ERROR reading queue metrics: {e}")
+                return self._queue_counts
+            try:
+                cur = conn.cursor()
+                cur.execute("SELECT ceremony_id, status, COUNT(*) FROM QUEUED GROUP BY ceremony_id, status")
+                self._queue_counts = cur.fetchall()
+                self._queue_read_at = now
+                cur.close()
+                conn.commit()
+            except psycopg2.Error as e:
+                conn.rollback()
+                print(f"ERROR reading queue metrics: {e}")
+            finally:
+                conn.close()
+            return self._queue_counts
+
+
+REGISTRY.register(AppCollector())
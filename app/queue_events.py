@@ -0,0 +1,107 @@
+import asyncio
+import json
+import select
+import threading
+import time
+import psycopg2
+
+from app.db import get_db_config
+
+# Fed by the notify_queued_change() trigger on QUEUED (scripts/createDB.py)
+QUEUE_CHANNEL = "queued_changes"
+SUBSCRIBER_BACKLOG = 1000
+RESYNC = {"op": "RESYNC"}
+
+
+class QueueEventBroker:
+    """
+    Fans QUEUED change notifications out to per-ceremony SSE subscribers.
+
+    One LISTEN connection per worker (outside the request pool) runs in a
+    daemon thread and hands events to each subscriber's asyncio.Queue on its
+    event loop. A subscriber that falls behind, or any gap caused by a lost
+    LISTEN connection, gets a RESYNC marker so its stream re-sends a snapshot.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._thread = None
+        self.connected = False
+
+    def subscribe(self, ceremony_id):
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_BACKLOG)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._subscribers.setdefault(ceremony_id, set()).add((loop, queue))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._listen, name="queue-events", daemon=True)
+                self._thread.start()
+        return queue
+
+    def unsubscribe(self, ceremony_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(ceremony_id, set())
+            subscribers.difference_update({s for s in subscribers if s[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(ceremony_id, None)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+    def publish(self, event):
+        with self._lock:
+            if event is RESYNC:
+                targets = [s for subs in self._subscribers.values() for s in subs]
+            else:
+                targets = list(self._subscribers.get(event.get("ceremony_id"), ()))
+        for loop, queue in targets:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                pass  # subscriber's event loop already shut down
+
+    def _listen(self):
+        backoff = 1
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(**get_db_config())
+                conn.autocommit = True
+                cur = conn.cursor()
+                cur.execute(f"LISTEN {QUEUE_CHANNEL};")
+                self.connected = True
+                backoff = 1
+                # anything that changed while we were disconnected was missed
+                self.publish(RESYNC)
+                while True:
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        try:
+                            self.publish(json.loads(notify.payload))
+                        except ValueError:
+                            print(f"ERROR bad queue notification: {notify.payload}")
+            except Exception as e:
+                self.connected = False
+                print(f"ERROR queue event listener: {e}")
+                if conn is not None and not conn.closed:
+                    conn.close()
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+
+def _offer(queue, event):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        # slow client: drop its backlog and make it reload the snapshot
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(RESYNC)
+
+
+broker = QueueEventBroker()
@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import psycopg2
+
+from app.db import get_db_connection
+from app.report_data import (
+    REPORT_REFRESH_MODE,
+    REPORT_REFRESH_SECONDS,
+    get_summary_state,
+    refresh_report_summary,
+    use_report_summary,
+)
+
+REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", "300"))
+REPORT_CACHE_MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "8"))
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+
+def get_data_version():
+    """
+    Version of the data the reports are built from. In live mode that is the
+    report_data_version sequence, bumped by statement triggers on STUDENT /
+    DEGREE / CEREMONY / QUEUED (scripts/createDB.py); reading a sequence takes
+    no locks. Otherwise it is (version, refresh time) of report_summary, after
+    an on_read refresh if the sequence has moved past it or the view is older
+    than REPORT_REFRESH_SECONDS; the refresh time is part of it because a
+    refresh can pick up writes without the version moving.
+    Returns None if the schema predates either.
+    """
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT last_value, is_called FROM report_data_version")
+        last_value, is_called = cur.fetchone()
+        cur.close()
+        conn.commit()
+        version = last_value if is_called else 0
+        if use_report_summary():
+            summary_version, refreshed_at, age = get_summary_state(conn)
+            # nextval isn't transactional: a refresh taken while a writer was still open
+            # stores its version without its rows, so an old summary is refreshed anyway
+            outdated = summary_version != version or age is None or age >= REPORT_REFRESH_SECONDS
+            if REPORT_REFRESH_MODE == "on_read" and outdated and _refresh_due():
+                if refresh_summary(conn, only_if_due=True):
+                    summary_version, refreshed_at, age = get_summary_state(conn)
+            conn.commit()
+            return (summary_version, refreshed_at) if summary_version is not None else None
+        return version
+    except psycopg2.Error:
+        conn.rollback()
+        return None
+    finally:
+        conn.close()
+
+
+_last_refresh = None
+_refresh_lock = threading.Lock()
+
+
+def _refresh_due():
+    return _last_refresh is None or time.monotonic() - _last_refresh >= REPORT_REFRESH_SECONDS
+
+
+def refresh_summary(conn=None, only_if_due=False):
+    """Refreshes report_summary; only_if_due skips it if another thread just did."""
+    global _last_refresh
+    own_conn = conn is None
+    conn = conn or get_db_connection()
+    try:
+        with _refresh_lock:
+            if only_if_due and not _refresh_due():
+                return False
+            if not refresh_report_summary(conn):
+                return False
+            _last_refresh = time.monotonic()
+            return True
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def _refresh_loop():
+    while True:
+        time.sleep(REPORT_REFRESH_SECONDS)
+        try:
+            refresh_summary()
+        except Exception as e:
+            print(f"ERROR refreshing report summary: {e}")
+
+
+def start_summary_refresh():
+    """Starts the background refresh of report_summary in interval mode (called from the app lifespan)."""
+    if REPORT_REFRESH_MODE == "interval" and REPORT_REFRESH_SECONDS > 0:
+        threading.Thread(target=_refresh_loop, name="report-summary-refresh", daemon=True).start()
+
+
+class ReportCache:
+    """
+    Small LRU of rendered report artifacts keyed by (name, data version).
+    Entries also expire after REPORT_CACHE_TTL, which bounds staleness if a
+    writer bumps the version before its transaction commits. Concurrent
+    misses for the same key wait for one build instead of all rendering.
+    """
+
+    def __init__(self, ttl, max_entries, max_bytes):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._building = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, size, expires = entry
+        if expires < time.monotonic():
+            self._evict(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _evict(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _put(self, key, value, size):
+        if key in self._entries:
+            self._evict(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size, time.monotonic() + self.ttl)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._evict(next(iter(self._entries)))
+
+    def get_or_build(self, name, build, sizeof=len, cache_if=None):
+        version = get_data_version()
+        if version is None:
+            return build()
+        key = (name, version)
+
+        while True:
+            with self._lock:
+                value = self._get(key)
+                if value is not None:
+                    self.hits += 1
+                    return value
+                pending = self._building.get(key)
+                if pending is None:
+                    pending = self._building[key] = threading.Event()
+                    self.misses += 1
+                    break
+            pending.wait()
+
+        try:
+            value = build()
+            if cache_if is None or cache_if(value):
+                with self._lock:
+                    self._put(key, value, sizeof(value))
+            return value
+        finally:
+            with self._lock:
+                self._building.pop(key, None)
+            pending.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+report_cache = ReportCache(REPORT_CACHE_TTL, REPORT_CACHE_MAX_ENTRIES, REPORT_CACHE_MAX_BYTES)
@@ -0,0 +1,204 @@
+import os
+
+# Every dataset behind the reports, computed by one statement on one connection.
+# Shared by the API (app/routes/reports.py) and scripts/reports.py, so it only
+# depends on the connection it is handed.
+
+# Where report reads come from:
+#   live     - run REPORT_DATASET_SQL on every read
+#   on_read  - read the report_summary materialized view, refreshing it first when
+#              report_data_version moved or the view is older than REPORT_REFRESH_SECONDS
+#              (at most once per REPORT_REFRESH_SECONDS). The age check catches writes
+#              still uncommitted at the last refresh: nextval already counted them.
+#   interval - read report_summary; the API refreshes it every REPORT_REFRESH_SECONDS
+#   manual   - read report_summary; refresh with scripts/reportSummary.py (e.g. cron)
+REPORT_REFRESH_MODE = os.getenv("REPORT_REFRESH_MODE", "live").lower()
+REPORT_REFRESH_SECONDS = float(os.getenv("REPORT_REFRESH_SECONDS", "60"))
+REPORT_SUMMARY_VIEW = "report_summary"
+# pg_try_advisory_xact_lock key so only one worker refreshes at a time
+REPORT_REFRESH_LOCK = 4711013
+
+# STUDENT is read once for the degree / degree type / opt-in breakdowns
+# (GROUPING SETS), once more through CEREMONY -> DEGREE for per-ceremony counts,
+# and QUEUED once for both the status and per-ceremony breakdowns.
+REPORT_DATASET_SQL = """
+    WITH student_counts AS (
+        SELECT
+            GROUPING(degree_name) AS g_degree,
+            GROUPING(degree_type) AS g_degree_type,
+            degree_name,
+            degree_type,
+            opt_in_biometric,
+            COUNT(*) AS n
+        FROM STUDENT
+        GROUP BY GROUPING SETS ((degree_name), (degree_type), (opt_in_biometric))
+    ),
+    ceremony_counts AS (
+        SELECT C.ceremony_id, C.name, COUNT(S.PID) AS n
+        FROM CEREMONY C
+        LEFT JOIN DEGREE D ON D.ceremony_id = C.ceremony_id
+        LEFT JOIN STUDENT S ON S.degree_name = D.degree_name
+        GROUP BY C.ceremony_id, C.name
+    ),
+    queue_counts AS (
+        SELECT GROUPING(status) AS g_status, status, ceremony_id, COUNT(*) AS n
+        FROM QUEUED
+        GROUP BY GROUPING SETS ((status), (ceremony_id))
+    )
+    SELECT 'degree' AS dimension, degree_name AS key, NULL::text AS label, n FROM student_counts WHERE g_degree = 0
+    UNION ALL
+    SELECT 'degree_type', degree_type, NULL, n FROM student_counts WHERE g_degree_type = 0
+    UNION ALL
+    SELECT 'opt_in', opt_in_biometric::text, NULL, n FROM student_counts WHERE g_degree = 1 AND g_degree_type = 1
+    UNION ALL
+    SELECT 'ceremony', ceremony_id::text, name, n FROM ceremony_counts
+    UNION ALL
+    SELECT 'queue_status', status, NULL, n FROM queue_counts WHERE g_status = 0
+    UNION ALL
+    SELECT 'queue_ceremony', ceremony_id::text, NULL, n FROM queue_counts WHERE g_status = 1
+"""
+
+# Materialized view body: the dataset plus the report_data_version it was built at
+# and when it was built (epoch milliseconds)
+REPORT_SUMMARY_SQL = REPORT_DATASET_SQL + """
+    UNION ALL
+    SELECT 'data_version', NULL, NULL, CASE WHEN is_called THEN last_value ELSE 0 END
+    FROM report_data_version
+    UNION ALL
+    SELECT 'refreshed_at', NULL, NULL, (extract(epoch FROM now()) * 1000)::bigint
+"""
+SUMMARY_META_DIMENSIONS = ("data_version", "refreshed_at")
+
+OPT_IN_LABELS = {"true": "Opt-in", "false": "Not Opt-in"}
+
+
+def _breakdown(pairs, label=None):
+    """(labels, values, rows) sorted by count, largest first"""
+    labels, values, cleaned_rows = [], [], []
+    for key, count in sorted(pairs, key=lambda p: p[1], reverse=True):
+        name = label(key) if label else key
+        name = name if name is not None else "Unknown"
+        labels.append(name)
+        values.append(count)
+        cleaned_rows.append([name, count])
+    return labels, values, cleaned_rows
+
+
+def _distribution(values):
+    if not values:
+        return {"min": 0, "max": 0, "avg": 0.0, "count": 0, "sum": 0}
+    return {
+        "min": min(values),
+        "max": max(values),
+        "avg": sum(values) / len(values),
+        "count": len(values),
+        "sum": sum(values),
+    }
+
+
+def build_report_dataset(rows):
+    """
+    Shapes (dimension, key, label, count) rows into the report dataset.
+    Breakdowns are (labels, values, rows) tuples; distributions are
+    min/max/avg/count/sum of the grouped counts.
+    """
+    groups = {}
+    by_ceremony_name = {}
+    for dimension, key, label, count in rows:
+        groups.setdefault(dimension, []).append((key, count))
+        # the pie chart groups ceremonies by name; the distribution by ceremony
+        if dimension == "ceremony":
+            by_ceremony_name[label] = by_ceremony_name.get(label, 0) + count
+
+    opt_in = dict(groups.get("opt_in", []))
+
+    return {
+        "students_per_degree": _breakdown(groups.get("degree", [])),
+        "queued_status": _breakdown(groups.get("queue_status", [])),
+        "students_per_degree_type": _breakdown(groups.get("degree_type", [])),
+        "biometric_opt_in": _breakdown(groups.get("opt_in", []), label=lambda k: OPT_IN_LABELS.get(k)),
+        "students_per_ceremony": _breakdown(by_ceremony_name.items()),
+        "overall": {
+            "total_students": sum(opt_in.values()),
+            "total_opt_in": opt_in.get("true", 0),
+            "total_not_opt_in": opt_in.get("false", 0),
+        },
+        "distributions": {
+            "students_per_degree": _distribution([c for _, c in groups.get("degree", [])]),
+            "students_per_ceremony": _distribution([c for _, c in groups.get("ceremony", [])]),
+            "students_per_degree_type": _distribution([c for _, c in groups.get("degree_type", [])]),
+            "queued_per_ceremony": _distribution([c for _, c in groups.get("queue_ceremony", [])]),
+        },
+    }
+
+
+def use_report_summary():
+    return REPORT_REFRESH_MODE != "live"
+
+
+def fetch_report_dataset(conn, from_summary=None):
+    """from_summary defaults to the REPORT_REFRESH_MODE setting"""
+    if from_summary is None:
+        from_summary = use_report_summary()
+    cur = conn.cursor()
+    try:
+        if from_summary:
+            cur.execute(
+                f"SELECT dimension, key, label, n FROM {REPORT_SUMMARY_VIEW} WHERE dimension <> ALL(%s)",
+                (list(SUMMARY_META_DIMENSIONS),),
+            )
+        else:
+            cur.execute(REPORT_DATASET_SQL)
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+    return build_report_dataset(rows)
+
+
+def get_summary_state(conn):
+    """
+    (report_data_version as of the last refresh of report_summary, when that
+    refresh ran in epoch ms, seconds since then). The last two are None for a
+    view created before refreshed_at was recorded.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"""
+            SELECT MAX(n) FILTER (WHERE dimension = 'data_version'),
+                   MAX(n) FILTER (WHERE dimension = 'refreshed_at'),
+                   extract(epoch FROM now()) - MAX(n) FILTER (WHERE dimension = 'refreshed_at') / 1000.0
+            FROM {REPORT_SUMMARY_VIEW}
+            WHERE dimension = ANY(%s)
+            """,
+            (list(SUMMARY_META_DIMENSIONS),),
+        )
+        version, refreshed_at, age = cur.fetchone()
+    finally:
+        cur.close()
+    return version, refreshed_at, float(age) if age is not None else None
+
+
+def create_report_summary(cur):
+    """(Re)create report_summary; the unique index allows REFRESH ... CONCURRENTLY"""
+    cur.execute(f"DROP MATERIALIZED VIEW IF EXISTS {REPORT_SUMMARY_VIEW}")
+    cur.execute(f"CREATE MATERIALIZED VIEW {REPORT_SUMMARY_VIEW} AS {REPORT_SUMMARY_SQL}")
+    cur.execute(f"CREATE UNIQUE INDEX {REPORT_SUMMARY_VIEW}_key_idx ON {REPORT_SUMMARY_VIEW} (dimension, key)")
+
+
+def refresh_report_summary(conn):
+    """
+    Rebuilds report_summary without blocking readers. Returns False (and does
+    nothing) if another worker is already refreshing it.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT pg_try_advisory_xact_lock(%s)", (REPORT_REFRESH_LOCK,))
+        if not cur.fetchone()[0]:
+            conn.rollback()
+            return False
+        cur.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {REPORT_SUMMARY_VIEW}")
+        conn.commit()
+        return True
+    finally:
+        cur.close()
@@ -0,0 +1,320 @@
+import codecs
+import csv
+import io
+import json
+import os
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from pydantic import ValidationError
+
+from app.schemas import StudentIn
+from app.face.scan import get_embeddings, bytes_to_cv2, store_face_bytes
+
+# Bulk roster import, shared by POST /api/students/import and scripts/importRoster.py.
+# Records stream through in batches: photos are decoded and embedded on a worker
+# pool while the previous batch is written, and each batch is loaded with COPY
+# and committed on its own, so a rerun skips every PID that already made it in.
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "64"))
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "2"))
+
+ROSTER_FIELDS = ["PID", "name", "email", "degree_name", "degree_type", "opt_in_biometric"]
+TRUE_VALUES = {"1", "true", "t", "yes", "y"}
+
+
+class RosterLineError:
+    """A roster line that could not be parsed; reported as a failed row."""
+
+    def __init__(self, line, error):
+        self.line = line
+        self.error = error
+
+
+def _decoded_lines(fileobj, bad_lines):
+    # decode line by line so one bad byte sequence only costs its own row
+    for number, raw in enumerate(fileobj, start=1):
+        if number == 1 and raw.startswith(codecs.BOM_UTF8):
+            raw = raw[len(codecs.BOM_UTF8):]
+        try:
+            yield raw.decode("utf-8")
+        except UnicodeDecodeError:
+            bad_lines.add(number)
+            yield raw.decode("utf-8", errors="replace")
+
+
+def iter_roster(fileobj, fmt):
+    """
+    Yields one dict per roster row from a binary file object. fmt is "csv"
+    (header row with the STUDENT columns plus `photo`) or "jsonl". Rows that
+    can't be decoded or parsed are yielded as RosterLineError instead.
+    """
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError(f"Unknown roster format '{fmt}' (expected csv or jsonl)")
+    bad_lines = set()
+    lines = _decoded_lines(fileobj, bad_lines)
+
+    if fmt == "jsonl":
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            if number in bad_lines:
+                yield RosterLineError(number, "not valid UTF-8")
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                yield RosterLineError(number, f"invalid JSON ({e.msg})")
+        return
+
+    reader = csv.DictReader(lines)
+    while True:
+        first = reader.line_num + 1
+        try:
+            record = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield RosterLineError(reader.line_num, f"invalid CSV ({e})")
+            continue
+        # a quoted field can span lines; line_num is the record's last line
+        if any(n in bad_lines for n in range(first, reader.line_num + 1)):
+            yield RosterLineError(reader.line_num, "not valid UTF-8")
+        else:
+            yield record
+
+
+def roster_format(filename):
+    return "jsonl" if filename.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+class PhotoSource:
+    """Reads roster photos by file name from a directory or a zip archive."""
+
+    def __init__(self, path_or_file=None):
+        self._dir = None
+        self._zip = None
+        self._lock = threading.Lock()
+        if path_or_file is None:
+            return
+        if isinstance(path_or_file, str) and os.path.isdir(path_or_file):
+            self._dir = path_or_file
+        else:
+            self._zip = zipfile.ZipFile(path_or_file)
+            # archives often nest the photos in a folder; match on the base name
+            self._names = {os.path.basename(n): n for n in self._zip.namelist() if not n.endswith("/")}
+
+    def read(self, name):
+        if self._dir is not None:
+            path = os.path.join(self._dir, os.path.basename(name))
+            if not os.path.isfile(path):
+                raise ValueError(f"Photo '{name}' not found")
+            with open(path, "rb") as f:
+                return f.read()
+        if self._zip is not None:
+            member = self._names.get(os.path.basename(name))
+            if member is None:
+                raise ValueError(f"Photo '{name}' not found in archive")
+            # import workers share one archive handle
+            with self._lock:
+                return self._zip.read(member)
+        raise ValueError("No photos were provided")
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+
+
+def _clean(record):
+    row = {k: (v.strip() if isinstance(v, str) else v) for k, v in record.items()}
+    row = {k: (None if v == "" else v) for k, v in row.items()}
+    opt_in = row.get("opt_in_biometric")
+    if isinstance(opt_in, str):
+        row["opt_in_biometric"] = opt_in.lower() in TRUE_VALUES
+    elif opt_in is None:
+        row["opt_in_biometric"] = False
+    return row
+
+
+def _prepare_batch(batch, photos, embed):
+    """
+    Validates a batch and embeds its photos (runs on an import worker).
+    Returns (students, failures); students are (index, StudentIn, photo bytes,
+    file extension, embedding) tuples.
+    """
+    students, failures, images, owners = [], [], [], []
+    for index, record in batch:
+        if isinstance(record, RosterLineError):
+            failures.append(_failure(index, None, f"Line {record.line}: {record.error}"))
+            continue
+        if not isinstance(record, dict):
+            # a JSONL line holding a list, string or number
+            failures.append(_failure(index, None, "Roster row must be a JSON object"))
+            continue
+        row = _clean(record)
+        try:
+            student = StudentIn(**{k: row.get(k) for k in ROSTER_FIELDS})
+        except ValidationError as e:
+            failures.append(_failure(index, row.get("PID"), e.errors()[0]["msg"]))
+            continue
+        image_bytes = file_ext = None
+        if student.opt_in_biometric:
+            if not row.get("photo"):
+                failures.append(_failure(index, student.PID, "opt_in_biometric requires a photo"))
+                continue
+            try:
+                image_bytes = photos.read(row["photo"])
+                images.append(bytes_to_cv2(image_bytes))
+            except ValueError as e:
+                failures.append(_failure(index, student.PID, str(e)))
+                continue
+            owners.append(len(students))
+            file_ext = os.path.splitext(row["photo"])[1].lstrip(".").lower() or "jpg"
+        students.append([index, student, image_bytes, file_ext, None])
+
+    if images:
+        for owner, embedding in zip(owners, embed(images)):
+            students[owner][4] = embedding
+
+    kept = []
+    for entry in students:
+        if entry[1].opt_in_biometric and entry[4] is None:
+            failures.append(_failure(entry[0], entry[1].PID, "No face detected in image"))
+        else:
+            kept.append(tuple(entry))
+    return kept, failures
+
+
+def _failure(index, pid, error):
+    return {"row": index, "PID": pid, "error": error}
+
+
+def _copy(cur, table, columns, rows):
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+
+def _load_batch(conn, students, degrees):
+    """
+    Writes one prepared batch in a single transaction.
+    Returns (inserted PIDs, faces stored, failures, skipped).
+    """
+    cur = conn.cursor()
+    failures = []
+    try:
+        cur.execute("SELECT PID FROM STUDENT WHERE PID = ANY(%s)", ([s[1].PID for s in students],))
+        existing = {r[0] for r in cur.fetchall()}
+        skipped = sum(1 for s in students if s[1].PID in existing)
+
+        pending, seen = [], set()
+        for entry in students:
+            student = entry[1]
+            if student.PID in existing:
+                continue
+            if student.PID in seen:
+                failures.append(_failure(entry[0], student.PID, "Duplicate PID in roster"))
+                continue
+            if student.degree_name is not None and student.degree_name not in degrees:
+                failures.append(_failure(entry[0], student.PID, f"Unknown degree '{student.degree_name}'"))
+                continue
+            seen.add(student.PID)
+            pending.append(entry)
+        if not pending:
+            conn.commit()
+            return [], 0, failures, skipped
+
+        # COPY cannot skip conflicting rows, so stage the batch and insert what fits
+        cur.execute("CREATE TEMP TABLE roster_stage (LIKE STUDENT INCLUDING DEFAULTS) ON COMMIT DROP")
+        _copy(cur, "roster_stage", ROSTER_FIELDS, [
+            [getattr(s[1], f) for f in ROSTER_FIELDS] for s in pending
+        ])
+        cur.execute(
+            f"""
+            INSERT INTO STUDENT ({', '.join(ROSTER_FIELDS)})
+            SELECT {', '.join(ROSTER_FIELDS)} FROM roster_stage
+            ON CONFLICT DO NOTHING
+            RETURNING PID
+            """
+        )
+        inserted = {r[0] for r in cur.fetchall()}
+
+        faces = []
+        for index, student, image_bytes, file_ext, embedding in pending:
+            if student.PID not in inserted:
+                failures.append(_failure(index, student.PID, "PID or email already exists"))
+            elif embedding is not None:
+                storage_uri = store_face_bytes(student.PID, image_bytes, file_ext)
+                faces.append((student.PID, storage_uri, embedding))
+
+        if faces:
+            _copy(cur, "FACE_IMAGE", ["SPID", "storage_uri", "embedding"], [
+                [pid, uri, "[" + ",".join(map(str, emb)) + "]"] for pid, uri, emb in faces
+            ])
+        conn.commit()
+        return sorted(inserted), len(faces), failures, skipped
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def import_roster(connect, records, photos, embed=get_embeddings, batch_size=None, workers=None, progress=None):
+    """
+    Imports roster records (dicts). `connect` returns a DB connection; one is
+    taken per batch write and closed right after, so none is held while photos
+    are embedded. `embed` turns a list of cv2 images into embeddings (None
+    where no face was found). Students whose PID is already in STUDENT are
+    skipped, which makes an interrupted import safe to rerun.
+    Returns {"imported", "faces", "skipped", "failed", "failures"}.
+    """
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+    workers = workers or IMPORT_WORKERS
+
+    conn = connect()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT degree_name FROM DEGREE")
+        degrees = {r[0] for r in cur.fetchall()}
+        cur.close()
+        conn.commit()
+    finally:
+        conn.close()
+
+    report = {"imported": 0, "faces": 0, "skipped": 0, "failed": 0, "failures": []}
+    numbered = enumerate(records, start=1)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="roster-import") as pool:
+        # keep a couple of batches embedding ahead of the one being written
+        in_flight = []
+
+        def submit_next():
+            batch = list(islice(numbered, batch_size))
+            if batch:
+                in_flight.append(pool.submit(_prepare_batch, batch, photos, embed))
+            return bool(batch)
+
+        while len(in_flight) < workers + 1 and submit_next():
+            pass
+        while in_flight:
+            students, failures = in_flight.pop(0).result()
+            submit_next()
+            conn = connect()
+            try:
+                inserted, faces, load_failures, skipped = _load_batch(conn, students, degrees)
+            finally:
+                conn.close()
+
+            report["imported"] += len(inserted)
+            report["faces"] += faces
+            report["skipped"] += skipped
+            report["failures"].extend(failures + load_failures)
+            report["failed"] = len(report["failures"])
+            if progress:
+                progress(report)
+
+    report["failures"].sort(key=lambda f: f["row"])
+    return report
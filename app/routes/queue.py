@@ -1,9 +1,19 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from app.schemas import QueueIn, DequeueIn, ViewQueueIn
 from app.db import get_db_connection
+from app.queue_events import broker, RESYNC
+from datetime import datetime
+import asyncio
+import json
 import psycopg2
+import os
 
-
+QUEUE_POP_MAX = int(os.getenv("QUEUE_POP_MAX", "25"))
+QUEUE_VIEW_MAX = int(os.getenv("QUEUE_VIEW_MAX", "500"))
+QUEUE_STREAM_KEEPALIVE = float(os.getenv("QUEUE_STREAM_KEEPALIVE", "15"))
 
 router = APIRouter(prefix="/api/queue", tags=["queue"])
 
@@ -13,40 +23,44 @@ def add_to_queue(q: QueueIn):
     conn = get_db_connection()
     try:
         cur = conn.cursor()
-        #get student
+        # Resolve student -> degree -> ceremony and insert in one round trip.
+        # found / ceremony_id / queued tell the three failure cases apart.
         cur.execute(
-            "SELECT degree_name FROM STUDENT WHERE PID = %s;",
+            """
+            WITH target AS (
+                SELECT s.PID, d.ceremony_id
+                FROM STUDENT s
+                LEFT JOIN DEGREE d ON d.degree_name = s.degree_name
+                WHERE s.PID = %s
+            ),
+            inserted AS (
+                INSERT INTO QUEUED (SPID, ceremony_id)
+                SELECT PID, ceremony_id
+                FROM target
+                WHERE ceremony_id IS NOT NULL
+                ON CONFLICT (SPID, ceremony_id) DO NOTHING
+                RETURNING ceremony_id
+            )
+            SELECT
+                EXISTS (SELECT 1 FROM target),
+                (SELECT ceremony_id FROM target),
+                EXISTS (SELECT 1 FROM inserted);
+            """,
             (q.SPID,)
         )
-        row = cur.fetchone()
-        if not row:
+        found, ceremony_id, queued = cur.fetchone()
+        if not found:
             raise HTTPException(status_code=404, detail="Student not found")
-        degree_name = row[0]
-        #get ceremony id
-        cur.execute(
-            "SELECT ceremony_id FROM DEGREE WHERE degree_name = %s;",
-            (degree_name,)
-        )
-        row = cur.fetchone()
-        if not row or row[0] is None:
+        if ceremony_id is None:
             raise HTTPException(status_code=400, detail="No ceremony assigned for this degree")
-        ceremony_id = row[0]
-        cur.execute(
-            """
-            INSERT INTO QUEUED (SPID, ceremony_id)
-            VALUES (%s, %s)
-            """,
-            (q.SPID, ceremony_id)
-        )
+        if not queued:
+            raise HTTPException(
+                status_code=409,
+                detail="Student is already queued for this ceremony"
+            )
         conn.commit()
         return {"message": f"Student {q.SPID} queued for ceremony {ceremony_id}"}
-    
-    except psycopg2.errors.UniqueViolation:
-        conn.rollback()
-        raise HTTPException(
-            status_code=409,
-            detail="Student is already queued for this ceremony"
-        )
+
     except psycopg2.Error as e:
         conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
@@ -56,68 +70,67 @@ def add_to_queue(q: QueueIn):
 
 @router.post("/pop")
 def dequeue_next_student(d: DequeueIn):
+    """
+    Claims the next `count` pending students (oldest first) and marks them
+    called. The top-level fields describe the first student, as before;
+    `students` lists every claimed student in queue order.
+    """
+    if d.count < 1 or d.count > QUEUE_POP_MAX:
+        raise HTTPException(status_code=400, detail=f"count must be between 1 and {QUEUE_POP_MAX}")
+
     conn = get_db_connection()
 
     try:
         cur = conn.cursor()
 
-        # Get the next pending student in line (and lock row)
+        # Lock, mark called and join STUDENT in one statement.
+        # SKIP LOCKED lets concurrent announcers claim disjoint rows.
         cur.execute(
             """
-            SELECT SPID
-            FROM QUEUED
-            WHERE ceremony_id = %s AND status = 'pending'
-            ORDER BY time_queued
-            FOR UPDATE SKIP LOCKED
-            LIMIT 1;
+            WITH next AS (
+                SELECT SPID, ceremony_id
+                FROM QUEUED
+                WHERE ceremony_id = %s AND status = 'pending'
+                ORDER BY time_queued
+                FOR UPDATE SKIP LOCKED
+                LIMIT %s
+            ),
+            claimed AS (
+                UPDATE QUEUED q
+                SET status = 'called'
+                FROM next
+                WHERE q.SPID = next.SPID AND q.ceremony_id = next.ceremony_id
+                RETURNING q.SPID, q.time_queued
+            )
+            SELECT s.PID, s.name, s.email, s.degree_name, s.degree_type, s.opt_in_biometric
+            FROM claimed c
+            JOIN STUDENT s ON s.PID = c.SPID
+            ORDER BY c.time_queued;
             """,
-            (d.ceremony_id,)
+            (d.ceremony_id, d.count)
         )
 
-        row = cur.fetchone()
+        rows = cur.fetchall()
 
-        if not row:
+        if not rows:
             raise HTTPException(status_code=404, detail="No pending students in queue")
 
-        pid = row[0]
-
-        # Update their status to 'called'
-        cur.execute(
-            """
-            UPDATE QUEUED
-            SET status = 'called'
-            WHERE SPID = %s AND ceremony_id = %s;
-            """,
-            (pid, d.ceremony_id)
-        )
-
-        # Get student info
-        cur.execute(
-            """
-            SELECT PID, name, email, degree_name, degree_type, opt_in_biometric
-            FROM STUDENT
-            WHERE PID = %s;
-            """,
-            (pid,)
-        )
-
-        student = cur.fetchone()
-
-        if not student:
-            raise HTTPException(status_code=404, detail="Student not found")
-
         conn.commit()
 
-        return {
-            "PID": student[0],
-            "name": student[1],
-            "email": student[2],
-            "degree_name": student[3],
-            "degree_type": student[4],
-            "opt_in_biometric": student[5],
-            "ceremony_id": d.ceremony_id,
-            "status": "called"
-        }
+        students = [
+            {
+                "PID": r[0],
+                "name": r[1],
+                "email": r[2],
+                "degree_name": r[3],
+                "degree_type": r[4],
+                "opt_in_biometric": r[5],
+                "ceremony_id": d.ceremony_id,
+                "status": "called"
+            }
+            for r in rows
+        ]
+        return {**students[0], "students": students}
 
     except psycopg2.Error as e:
         conn.rollback()
@@ -127,58 +140,78 @@ def dequeue_next_student(d: DequeueIn):
         cur.close()
         conn.close()
 
-@router.post("/view")
-def view_queue(v: ViewQueueIn):
+def _encode_cursor(row):
+    return f"{row[4].isoformat()}|{row[0]}"
+
+
+def _decode_cursor(cursor):
+    try:
+        time_queued, pid = cursor.split("|", 1)
+        return datetime.fromisoformat(time_queued), pid
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid queue cursor")
+
+
+def _fetch_queue_page(cur, ceremony_id, status, limit=None, after=None):
+    """
+    One page of a ceremony's queue in (time_queued, SPID) order, resuming
+    after `after` (keyset pagination on queued_ceremony_status_time_idx).
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    after_time, after_pid = _decode_cursor(after) if after else (None, None)
+    cur.execute(
+        """
+        SELECT s.PID, s.name, s.degree_name, s.degree_type, q.time_queued
+        FROM QUEUED q INNER JOIN STUDENT s
+        ON q.SPID = s.PID
+        WHERE q.ceremony_id = %s AND q.status = %s
+        AND (%s::timestamp IS NULL OR (q.time_queued, q.SPID) > (%s::timestamp, %s))
+        ORDER BY q.time_queued, q.SPID
+        LIMIT %s
+        """,
+        (ceremony_id, status, after_time, after_time, after_pid, limit + 1 if limit else None)
+    )
+    rows = cur.fetchall()
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1])
+    return rows, next_cursor
+
+
+def fetch_queue_snapshot(ceremony_id, limit=None, pending_after=None, called_after=None):
+    """pending and called students for one ceremony, oldest first"""
     conn = get_db_connection()
 
     try:
         cur = conn.cursor()
 
-        #get students with status pending
-        cur.execute(
-            """
-            SELECT q.status, s.PID, s.name, s.degree_name, s.degree_type, q.time_queued
-            FROM QUEUED q INNER JOIN STUDENT s
-            ON q.SPID = s.PID
-            WHERE q.ceremony_id = %s AND q.status = 'pending'
-            ORDER BY q.time_queued
-            """,
-            (v.ceremony_id,)
-        )
-        pending = cur.fetchall()
-        cur.execute(
-            """
-            SELECT q.status, s.PID, s.name, s.degree_name, s.degree_type, q.time_queued
-            FROM QUEUED q INNER JOIN STUDENT s
-            ON q.SPID = s.PID
-            WHERE q.ceremony_id = %s AND q.status = 'called'
-            ORDER BY q.time_queued
-            """,
-            (v.ceremony_id,)
-        )
-        called = cur.fetchall()
+        pending, pending_next = _fetch_queue_page(cur, ceremony_id, "pending", limit, pending_after)
+        called, called_next = _fetch_queue_page(cur, ceremony_id, "called", limit, called_after)
 
         return {
             'pending': [
                 {
-                    'PID': p[1],
-                    'name': p[2],
-                    'degree_name': p[3],
-                    'degree_type': p[4],
-                    'time_queued': p[5],
+                    'PID': p[0],
+                    'name': p[1],
+                    'degree_name': p[2],
+                    'degree_type': p[3],
+                    'time_queued': p[4],
                 }
                 for p in pending
             ],
             'called': [
                 {
-                    'PID': c[1],
-                    'name': c[2],
-                    'degree_name': c[3],
-                    'degree_type': c[4],
-                    'time_queued': c[5],
+                    'PID': c[0],
+                    'name': c[1],
+                    'degree_name': c[2],
+                    'degree_type': c[3],
+                    'time_queued': c[4],
                 }
                 for c in called
-            ]
+            ],
+            'pending_next': pending_next,
+            'called_next': called_next,
         }
 
     except psycopg2.Error as e:
@@ -188,3 +221,50 @@ def view_queue(v: ViewQueueIn):
     finally:
         cur.close()
         conn.close()
+
+
+@router.post("/view")
+def view_queue(v: ViewQueueIn):
+    if v.limit is not None and (v.limit < 1 or v.limit > QUEUE_VIEW_MAX):
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {QUEUE_VIEW_MAX}")
+    return fetch_queue_snapshot(v.ceremony_id, v.limit, v.pending_after, v.called_after)
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+@router.get("/stream/{ceremony_id}")
+async def stream_queue(ceremony_id: int, request: Request):
+    """
+    Server-sent events for one ceremony: a `snapshot` event (same shape as
+    /view) followed by a `change` event per QUEUED insert/update/delete.
+    """
+    async def events():
+        # subscribed here, not in the route, so a client gone before the first
+        # iteration never leaves a subscriber behind. Subscribe before reading the
+        # snapshot so no change slips in between; clients apply changes by PID,
+        # so replaying one already in the snapshot is harmless
+        queue = broker.subscribe(ceremony_id)
+        try:
+            snapshot = await run_in_threadpool(fetch_queue_snapshot, ceremony_id)
+            yield _sse("snapshot", snapshot)
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=QUEUE_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is RESYNC:
+                    snapshot = await run_in_threadpool(fetch_queue_snapshot, ceremony_id)
+                    yield _sse("snapshot", snapshot)
+                else:
+                    yield _sse("change", event)
+        finally:
+            broker.unsubscribe(ceremony_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
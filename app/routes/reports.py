@@ -1,5 +1,12 @@
 from app.db import get_db_connection
 import psycopg2
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
 from fastapi import APIRouter, HTTPException
 import matplotlib
 matplotlib.use("Agg")
@@ -11,6 +18,11 @@ from reportlab.platypus import SimpleDocTemplate, Image, Spacer, Paragraph
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.units import inch
+from app.report_cache import report_cache
+from app.report_data import fetch_report_dataset
+
+REPORT_RENDER_WORKERS = int(os.getenv("REPORT_RENDER_WORKERS", str(min(os.cpu_count() or 1, 4))))
+REPORT_RENDER_BUDGET = float(os.getenv("REPORT_RENDER_BUDGET", "20"))
 
 router = APIRouter(prefix="/api/reports", tags=["queue"])
 
@@ -18,18 +30,29 @@ router = APIRouter(prefix="/api/reports", tags=["queue"])
 @router.get("/charts")
 def get_reports():
     try:
-        charts = get_report_images(include_prefix=True)
-        return charts
+        return get_cached_charts()
     except psycopg2.Error as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.get("/charts/stream")
+def stream_reports():
+    """
+    NDJSON stream of {"index": i, "image": data_url} lines, one per chart,
+    in the order the charts finish rendering.
+    """
+    def lines():
+        for i, image in iter_report_images(include_prefix=True):
+            yield json.dumps({"index": i, "image": image}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 @router.get("/download")
 def download_report():
-    images = get_report_images(include_prefix=False)
-    pdf_buffer = create_pdf_from_base64(images)
+    pdf_bytes = get_cached_pdf()
     return StreamingResponse(
-        pdf_buffer,
+        BytesIO(pdf_bytes),
         media_type="application/pdf",
         headers={
             "Content-Disposition": 'attachment; filename="charts_report.pdf"'
@@ -37,136 +60,62 @@ def download_report():
     )
 
 
-# ---------- Data fetch functions ----------
+# ---------- Cached artifacts ----------
 
 
-def get_students_per_degree():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT degree_name, COUNT(*) AS num_students
-        FROM STUDENT
-        GROUP BY degree_name
-        ORDER BY num_students DESC;
-    """
-    )
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+def get_cached_charts():
+    """data-URL charts, re-rendered only when the report data version changes"""
+    return _get_cached_charts()[0]
 
-    labels, values, cleaned_rows = [], [], []
-    for degree_name, count in rows:
-        label = degree_name if degree_name is not None else "Unknown"
-        labels.append(label)
-        values.append(count)
-        cleaned_rows.append([label, count])
-    return labels, values, cleaned_rows
 
+def _get_cached_charts():
+    """(charts, complete); complete is False if the render budget cut some off"""
+    state = {"built": False, "rendered": set()}
 
-def get_queued_status_breakdown():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT status, COUNT(*) AS num_entries
-        FROM QUEUED
-        GROUP BY status
-        ORDER BY num_entries DESC;
-    """
+    def build():
+        state["built"] = True
+        images = [None] * 10
+        for i, image in iter_report_images(include_prefix=True):
+            images[i] = image
+            state["rendered"].add(i)
+        return images
+
+    charts = report_cache.get_or_build(
+        "charts",
+        build,
+        sizeof=lambda charts: sum(len(c) for c in charts if c),
+        # charts cut off by the render budget should be retried, not cached
+        cache_if=lambda charts: len(state["rendered"]) == len(charts),
     )
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+    # a cache hit is complete: partial renders never get cached
+    return charts, not state["built"] or len(state["rendered"]) == len(charts)
 
-    labels, values, cleaned_rows = [], [], []
-    for status, count in rows:
-        label = status if status is not None else "Unknown"
-        labels.append(label)
-        values.append(count)
-        cleaned_rows.append([label, count])
-    return labels, values, cleaned_rows
 
+def get_cached_pdf() -> bytes:
+    complete = []
 
-def get_students_per_degree_type():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT degree_type, COUNT(*) AS num_students
-        FROM STUDENT
-        GROUP BY degree_type
-        ORDER BY num_students DESC;
-    """
-    )
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+    def build():
+        charts, charts_complete = _get_cached_charts()
+        complete.append(charts_complete)
+        # the PDF only needs the charts without the data: prefix
+        images = [c.split(",", 1)[1] if c else None for c in charts]
+        return create_pdf_from_base64(images).getvalue()
 
-    labels, values, cleaned_rows = [], [], []
-    for degree_type, count in rows:
-        label = degree_type if degree_type is not None else "Unknown"
-        labels.append(label)
-        values.append(count)
-        cleaned_rows.append([label, count])
-    return labels, values, cleaned_rows
+    # a PDF missing charts is served once but not cached, like the charts themselves
+    return report_cache.get_or_build("pdf", build, cache_if=lambda _: all(complete))
 
 
-def get_biometric_opt_in_breakdown():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT opt_in_biometric, COUNT(*) AS num_students
-        FROM STUDENT
-        GROUP BY opt_in_biometric
-        ORDER BY num_students DESC;
-    """
-    )
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-
-    labels, values, cleaned_rows = [], [], []
-    for opt_in, count in rows:
-        if opt_in is True:
-            label = "Opt-in"
-        elif opt_in is False:
-            label = "Not Opt-in"
-        else:
-            label = "Unknown"
-        labels.append(label)
-        values.append(count)
-        cleaned_rows.append([label, count])
-    return labels, values, cleaned_rows
-
-
-def get_students_per_ceremony():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT
-            C.name AS ceremony_name,
-            COUNT(S.PID) AS num_students
-        FROM CEREMONY C
-        LEFT JOIN DEGREE D ON D.ceremony_id = C.ceremony_id
-        LEFT JOIN STUDENT S ON S.degree_name = D.degree_name
-        GROUP BY C.name
-        ORDER BY num_students DESC;
-    """
-    )
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+# ---------- Data fetch ----------
+
 
-    labels, values, cleaned_rows = [], [], []
-    for ceremony_name, count in rows:
-        label = ceremony_name if ceremony_name is not None else "Unknown"
-        labels.append(label)
-        values.append(count)
-        cleaned_rows.append([label, count])
-    return labels, values, cleaned_rows
+def get_report_dataset():
+    conn = get_db_connection()
+    try:
+        dataset = fetch_report_dataset(conn)
+        conn.commit()
+        return dataset
+    finally:
+        conn.close()
 
 
 # ---------- Ceremony type mapping ----------
@@ -188,106 +137,25 @@ def map_ceremony_to_type(ceremony_name: str) -> str:
     return "OTHER"
 
 
-# ---------- Managerial aggregates (DB only) ----------
+# ---------- Managerial aggregates ----------
 
 
-def get_managerial_aggregates():
+def get_managerial_aggregates(dataset):
     """
-    Compute managerial aggregates (min/avg/max etc.) for bar charts.
-    Mirrors the logic of build_managerial_reports but returns values in memory.
-    """
-    conn = get_db_connection()
-    cur = conn.cursor()
-
-    # 1) Overall student counts and biometric opt-in
-    cur.execute(
-        """
-        SELECT
-            COUNT(*) AS total_students,
-            SUM(CASE WHEN opt_in_biometric = TRUE THEN 1 ELSE 0 END) AS total_opt_in,
-            SUM(CASE WHEN opt_in_biometric = FALSE THEN 1 ELSE 0 END) AS total_not_opt_in
-        FROM STUDENT;
-    """
-    )
-    total_students, total_opt_in, total_not_opt_in = cur.fetchone()
-
-    # 2) Min/avg/max number of students per degree
-    cur.execute(
-        """
-        SELECT
-            MIN(num_students),
-            MAX(num_students),
-            AVG(num_students)
-        FROM (
-            SELECT degree_name, COUNT(*) AS num_students
-            FROM STUDENT
-            GROUP BY degree_name
-        ) t;
-    """
-    )
-    min_deg, max_deg, avg_deg = cur.fetchone()
-
-    # 3) Min/avg/max number of students per ceremony
-    cur.execute(
-        """
-        SELECT
-            MIN(num_students),
-            MAX(num_students),
-            AVG(num_students)
-        FROM (
-            SELECT
-                C.ceremony_id,
-                COUNT(S.PID) AS num_students
-            FROM CEREMONY C
-            LEFT JOIN DEGREE D ON D.ceremony_id = C.ceremony_id
-            LEFT JOIN STUDENT S ON S.degree_name = D.degree_name
-            GROUP BY C.ceremony_id
-        ) t;
-    """
-    )
-    min_cer, max_cer, avg_cer = cur.fetchone()
-
-    # 4) Min/avg/max number of students per degree type
-    cur.execute(
-        """
-        SELECT
-            MIN(num_students),
-            MAX(num_students),
-            AVG(num_students)
-        FROM (
-            SELECT degree_type, COUNT(*) AS num_students
-            FROM STUDENT
-            GROUP BY degree_type
-        ) t;
+    (min, avg, max) per distribution plus overall opt-in counts, for the bar charts.
     """
-    )
-    min_dtype, max_dtype, avg_dtype = cur.fetchone()
-
-    # 5) Min/avg/max queued entries per ceremony
-    cur.execute(
-        """
-        SELECT
-            MIN(num_entries),
-            MAX(num_entries),
-            AVG(num_entries)
-        FROM (
-            SELECT ceremony_id, COUNT(*) AS num_entries
-            FROM QUEUED
-            GROUP BY ceremony_id
-        ) t;
-    """
-    )
-    min_q, max_q, avg_q = cur.fetchone()
+    overall = dataset["overall"]
+    dist = dataset["distributions"]
 
-    cur.close()
-    conn.close()
+    def min_avg_max(d):
+        return (d["min"], float(d["avg"]), d["max"])
 
     return {
-        "overall": (total_students, total_opt_in or 0, total_not_opt_in or 0),
-        "students_per_degree": (min_deg or 0, float(avg_deg or 0), max_deg or 0),
-        "students_per_ceremony": (min_cer or 0, float(avg_cer or 0), max_cer or 0),
-        "students_per_degree_type": (min_dtype or 0, float(avg_dtype or 0), max_dtype or 0),
-        "queued_per_ceremony": (min_q or 0, float(avg_q or 0), max_q or 0),
+        "overall": (overall["total_students"], overall["total_opt_in"], overall["total_not_opt_in"]),
+        "students_per_degree": min_avg_max(dist["students_per_degree"]),
+        "students_per_ceremony": min_avg_max(dist["students_per_ceremony"]),
+        "students_per_degree_type": min_avg_max(dist["students_per_degree_type"]),
+        "queued_per_ceremony": min_avg_max(dist["queued_per_ceremony"]),
     }
 
 
@@ -367,108 +235,198 @@ def make_bar_chart(categories, values, title, ylabel, include_prefix=True):
 # ---------- Aggregate to images ----------
 
 
-def get_report_images(include_prefix: bool):
-    # Pie charts
-    spd_labels, spd_values, _ = get_students_per_degree()
-    spd_pie_chart_image = make_pie_chart(
-        labels=spd_labels,
-        values=spd_values,
-        title="Students Per Degree",
-        legend_title="Degree",
-        include_prefix=include_prefix,
-    )
+def get_chart_jobs(include_prefix: bool):
+    """
+    Fetches the report data and returns the ten charts as (function, kwargs)
+    render jobs, in display order: 5 pie charts, then 5 managerial bar charts.
+    """
+    dataset = get_report_dataset()
+    spd_labels, spd_values, _ = dataset["students_per_degree"]
+    q_labels, q_values, _ = dataset["queued_status"]
+    spt_labels, spt_values, _ = dataset["students_per_degree_type"]
+    o_labels, o_values, _ = dataset["biometric_opt_in"]
+    c_labels, c_values, _ = dataset["students_per_ceremony"]
+    mgr = get_managerial_aggregates(dataset)
 
-    q_labels, q_values, _ = get_queued_status_breakdown()
-    q_pie_chart_image = make_pie_chart(
-        labels=q_labels,
-        values=q_values,
-        title="Queued Status Breakdown",
-        legend_title="Status",
-        include_prefix=include_prefix,
-    )
+    return [
+        # Pie charts
+        (make_pie_chart, dict(
+            labels=spd_labels,
+            values=spd_values,
+            title="Students Per Degree",
+            legend_title="Degree",
+            include_prefix=include_prefix,
+        )),
+        (make_pie_chart, dict(
+            labels=q_labels,
+            values=q_values,
+            title="Queued Status Breakdown",
+            legend_title="Status",
+            include_prefix=include_prefix,
+        )),
+        (make_pie_chart, dict(
+            labels=spt_labels,
+            values=spt_values,
+            title="Students Per Degree Type",
+            legend_title="Degree Type",
+            include_prefix=include_prefix,
+        )),
+        (make_pie_chart, dict(
+            labels=o_labels,
+            values=o_values,
+            title="Biometric Opt-in Status",
+            legend_title="Opt in Status",
+            include_prefix=include_prefix,
+        )),
+        (make_pie_chart, dict(
+            labels=c_labels,
+            values=c_values,
+            title="Students Per Ceremony",
+            legend_title="Ceremony",
+            include_prefix=include_prefix,
+        )),
+        # Managerial bar charts
+        (make_bar_chart, dict(
+            categories=["Total Students", "Opt-in", "Not Opt-in"],
+            values=list(mgr["overall"]),
+            title="Overall Students and Biometric Opt-in",
+            ylabel="Count",
+            include_prefix=include_prefix,
+        )),
+        (make_bar_chart, dict(
+            categories=["Min per Degree", "Avg per Degree", "Max per Degree"],
+            values=list(mgr["students_per_degree"]),
+            title="Students per Degree (Min/Avg/Max)",
+            ylabel="Students",
+            include_prefix=include_prefix,
+        )),
+        (make_bar_chart, dict(
+            categories=["Min per Ceremony", "Avg per Ceremony", "Max per Ceremony"],
+            values=list(mgr["students_per_ceremony"]),
+            title="Students per Ceremony (Min/Avg/Max)",
+            ylabel="Students",
+            include_prefix=include_prefix,
+        )),
+        (make_bar_chart, dict(
+            categories=["Min per Degree Type", "Avg per Degree Type", "Max per Degree Type"],
+            values=list(mgr["students_per_degree_type"]),
+            title="Students per Degree Type (Min/Avg/Max)",
+            ylabel="Students",
+            include_prefix=include_prefix,
+        )),
+        (make_bar_chart, dict(
+            categories=["Min Queued/Ceremony", "Avg Queued/Ceremony", "Max Queued/Ceremony"],
+            values=list(mgr["queued_per_ceremony"]),
+            title="Queued Entries per Ceremony (Min/Avg/Max)",
+            ylabel="Queued Entries",
+            include_prefix=include_prefix,
+        )),
+    ]
 
-    spt_labels, spt_values, _ = get_students_per_degree_type()
-    spt_pie_chart_image = make_pie_chart(
-        labels=spt_labels,
-        values=spt_values,
-        title="Students Per Degree Type",
-        legend_title="Degree Type",
-        include_prefix=include_prefix,
-    )
 
-    o_labels, o_values, _ = get_biometric_opt_in_breakdown()
-    o_pie_chart_image = make_pie_chart(
-        labels=o_labels,
-        values=o_values,
-        title="Biometric Opt-in Status",
-        legend_title="Opt in Status",
-        include_prefix=include_prefix,
-    )
+def iter_report_images(include_prefix: bool, budget: float = None):
+    """
+    Renders the charts in the worker process pool and yields (index, image)
+    as each one finishes. Charts not done when the time budget runs out are
+    left out; running ones can't be cancelled, so the pool is recycled and
+    their workers terminated. Inline rendering (REPORT_RENDER_WORKERS=0)
+    can't interrupt a chart either, but starts no new ones past the budget.
+    """
+    budget = budget or REPORT_RENDER_BUDGET
+    jobs = get_chart_jobs(include_prefix)
+    pool = get_render_pool()
+    if pool is None:
+        deadline = time.monotonic() + budget
+        for i, (fn, kwargs) in enumerate(jobs):
+            if time.monotonic() >= deadline:
+                print(f"Report charts {i}-{len(jobs) - 1} skipped, past the {budget}s render budget")
+                return
+            yield i, fn(**kwargs)
+        return
 
-    c_labels, c_values, _ = get_students_per_ceremony()
-    c_pie_chart_image = make_pie_chart(
-        labels=c_labels,
-        values=c_values,
-        title="Students Per Ceremony",
-        legend_title="Ceremony",
-        include_prefix=include_prefix,
-    )
+    futures = {pool.submit(fn, **kwargs): i for i, (fn, kwargs) in enumerate(jobs)}
+    try:
+        for future in as_completed(futures, timeout=budget):
+            try:
+                image = future.result()
+            except BrokenProcessPool:
+                # another request recycled the pool while this chart was on it
+                print(f"Report chart {futures[future]} lost to a recycled render pool")
+                continue
+            yield futures[future], image
+    except FuturesTimeout:
+        late = [i for future, i in futures.items() if not future.done()]
+        print(f"Report charts {late} exceeded the {budget}s render budget")
+        recycle_render_pool(pool)
 
-    # Managerial bar charts
-    mgr = get_managerial_aggregates()
 
-    overall_bar = make_bar_chart(
-        categories=["Total Students", "Opt-in", "Not Opt-in"],
-        values=list(mgr["overall"]),
-        title="Overall Students and Biometric Opt-in",
-        ylabel="Count",
-        include_prefix=include_prefix,
-    )
+def get_report_images(include_prefix: bool):
+    images = [None] * 10
+    for i, image in iter_report_images(include_prefix):
+        images[i] = image
+    return images
 
-    deg_bar = make_bar_chart(
-        categories=["Min per Degree", "Avg per Degree", "Max per Degree"],
-        values=list(mgr["students_per_degree"]),
-        title="Students per Degree (Min/Avg/Max)",
-        ylabel="Students",
-        include_prefix=include_prefix,
-    )
 
-    cer_bar = make_bar_chart(
-        categories=["Min per Ceremony", "Avg per Ceremony", "Max per Ceremony"],
-        values=list(mgr["students_per_ceremony"]),
-        title="Students per Ceremony (Min/Avg/Max)",
-        ylabel="Students",
-        include_prefix=include_prefix,
-    )
+# ---------- Render process pool ----------
 
-    dtype_bar = make_bar_chart(
-        categories=["Min per Degree Type", "Avg per Degree Type", "Max per Degree Type"],
-        values=list(mgr["students_per_degree_type"]),
-        title="Students per Degree Type (Min/Avg/Max)",
-        ylabel="Students",
-        include_prefix=include_prefix,
-    )
+_render_pool = None
+_render_pool_lock = threading.Lock()
 
-    queued_bar = make_bar_chart(
-        categories=["Min Queued/Ceremony", "Avg Queued/Ceremony", "Max Queued/Ceremony"],
-        values=list(mgr["queued_per_ceremony"]),
-        title="Queued Entries per Ceremony (Min/Avg/Max)",
-        ylabel="Queued Entries",
-        include_prefix=include_prefix,
-    )
 
-    return [
-        spd_pie_chart_image,
-        q_pie_chart_image,
-        spt_pie_chart_image,
-        o_pie_chart_image,
-        c_pie_chart_image,
-        overall_bar,
-        deg_bar,
-        cer_bar,
-        dtype_bar,
-        queued_bar,
-    ]
+def _warm_render_worker():
+    # importing this module in the worker pulls in matplotlib / reportlab once
+    return os.getpid()
+
+
+def get_render_pool():
+    """
+    matplotlib holds the GIL while drawing, so charts render in separate
+    processes. spawn (not fork) keeps the workers free of the server's
+    threads and ONNX sessions. REPORT_RENDER_WORKERS=0 renders inline.
+    """
+    global _render_pool
+    if REPORT_RENDER_WORKERS <= 0:
+        return None
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(
+                max_workers=REPORT_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _render_pool
+
+
+def start_render_pool():
+    pool = get_render_pool()
+    if pool is not None:
+        for _ in range(REPORT_RENDER_WORKERS):
+            pool.submit(_warm_render_worker)
+
+
+def recycle_render_pool(pool):
+    """
+    Replaces a pool whose workers are stuck on over-budget charts. Running
+    futures ignore cancel(), so the workers are terminated; without this,
+    slow renders would keep piling up on the pool under load.
+    """
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is not pool:
+            return
+        _render_pool = None
+    processes = list((pool._processes or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    start_render_pool()
+
+
+def shutdown_render_pool():
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is not None:
+            _render_pool.shutdown(wait=False, cancel_futures=True)
+            _render_pool = None
 
 
 # ---------- PDF helper ----------
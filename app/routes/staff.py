@@ -8,10 +8,14 @@ router = APIRouter(prefix="/api/staff", tags=["staff"])
 
 @router.get("/", response_model=list[StaffOut])
 def list_staff():
-    conn = get_db_connection(); cur = conn.cursor()
-    cur.execute("SELECT staff_id, name, email, status FROM STAFF ORDER BY staff_id")
-    rows = cur.fetchall()
-    cur.close(); conn.close()
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT staff_id, name, email, status FROM STAFF ORDER BY staff_id")
+        rows = cur.fetchall()
+        cur.close()
+    finally:
+        conn.close()
     return [{"staff_id": r[0], "name": r[1], "email": r[2], "status": r[3]} for r in rows]
 
 @router.post("/", response_model=StaffOut)
@@ -69,11 +73,15 @@ def update_staff(staff_id: str, s: StaffIn):
 
 @router.delete("/{staff_id}")
 def delete_staff(staff_id: str):
-    conn = get_db_connection(); cur = conn.cursor()
-    cur.execute("DELETE FROM STAFF WHERE staff_id = %s RETURNING staff_id", (staff_id,))
-    row = cur.fetchone()
-    conn.commit()
-    cur.close(); conn.close()
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM STAFF WHERE staff_id = %s RETURNING staff_id", (staff_id,))
+        row = cur.fetchone()
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
     if not row:
         raise HTTPException(status_code=404, detail="Staff not found")
     return {"status": "deleted", "staff_id": staff_id}
@@ -1,9 +1,45 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, HTTPException, File, Form, UploadFile
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 from app.db import get_db_connection
-from app.schemas import StudentIn, StudentOut, MatchIn
+from app.schemas import StudentIn, StudentOut, MatchIn, MatchBatchIn, MatchOut, MatchResultOut
 from psycopg2.errors import UniqueViolation
-from app.face.scan import store_face, get_embedding, base64_to_cv2
+from app.face.scan import store_face_bytes, get_embedding, get_embeddings, base64_to_cv2, bytes_to_cv2, FACE_CROP_DET_SIZE
+from app.face.search import (
+    FACE_RERANK_CANDIDATES,
+    MATCH_TOP_K,
+    MATCH_TOP_K_MAX,
+    RERANK_SQL,
+    apply_search_params,
+    faces_to_fetch,
+    match_outcome,
+    nearest_faces_sql,
+    nearest_students,
+    search_params,
+)
+from app.face.gallery import gallery, gallery_ready
+from app.face.inference import run_inference, InferenceBusy, INFERENCE_WORKERS
+from app.roster import import_roster, iter_roster, roster_format, PhotoSource
+from app.timing import stage
+from app.metrics import MATCH_DISTANCE, MATCH_OUTCOMES
 import psycopg2
+import base64
+import os
+import threading
+import time
+import zipfile
+import numpy as np
+
+MATCH_BATCH_MAX = int(os.getenv("MATCH_BATCH_MAX", "16"))
+# Largest photo accepted by the multipart upload endpoints
+PHOTO_MAX_BYTES = int(os.getenv("PHOTO_MAX_BYTES", str(10 * 1024 * 1024)))
+# Seconds one roster import batch may wait on the shared inference executor
+IMPORT_INFERENCE_DEADLINE = float(os.getenv("IMPORT_INFERENCE_DEADLINE", "120"))
+# Inference jobs roster imports may have in flight at once; kept below
+# INFERENCE_WORKERS so kiosk matches always find a free worker
+IMPORT_INFERENCE_CONCURRENCY = int(os.getenv("IMPORT_INFERENCE_CONCURRENCY", str(max(INFERENCE_WORKERS - 1, 1))))
+_import_inference_slots = threading.BoundedSemaphore(IMPORT_INFERENCE_CONCURRENCY)
 
 router = APIRouter(prefix="/api/students", tags=["students"])
 
@@ -28,30 +64,102 @@ def list_students():
 
 @router.post("/", response_model=StudentOut)
 def insert_student(student: StudentIn):
+    photo = None
+    if student.opt_in_biometric and student.photo:
+        try:
+            header, encoded = student.photo.split(",", 1)
+            photo = (base64.b64decode(encoded), header.split(";")[0].split("/")[1])
+        except (ValueError, IndexError):
+            raise HTTPException(status_code=400, detail="photo must be a base64 data URL")
+    return _insert_student(student, photo)
+
+@router.post("/upload", response_model=StudentOut)
+def insert_student_upload(
+    PID: str = Form(...),
+    name: str = Form(...),
+    email: str = Form(...),
+    degree_name: Optional[str] = Form(None),
+    degree_type: Optional[str] = Form(None),
+    opt_in_biometric: bool = Form(False),
+    photo: Optional[UploadFile] = File(None),
+):
+    """
+    multipart/form-data variant of POST /api/students/: the photo arrives as
+    raw image bytes instead of a base64 data URL inside JSON
+    """
+    try:
+        student = StudentIn(
+            PID=PID, name=name, email=email, degree_name=degree_name,
+            degree_type=degree_type, opt_in_biometric=opt_in_biometric,
+        )
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    return _insert_student(student, read_upload(photo) if opt_in_biometric and photo else None)
+
+def read_upload(photo: UploadFile):
+    """
+    returns (image bytes, file extension) for an uploaded photo
+    """
+    image_bytes = photo.file.read(PHOTO_MAX_BYTES + 1)
+    if len(image_bytes) > PHOTO_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Photo larger than {PHOTO_MAX_BYTES} bytes")
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="Empty photo")
+    content_type = photo.content_type or ""
+    if content_type.startswith("image/"):
+        file_ext = content_type.split("/", 1)[1]
+    else:
+        file_ext = os.path.splitext(photo.filename or "")[1].lstrip(".").lower() or "jpg"
+    return image_bytes, file_ext
+
+def _insert_student(student: StudentIn, photo):
+    """
+    photo: (image bytes, file extension), required when the student opts in.
+    The bytes are written to disk and decoded for the embedding as-is.
+    """
+    embedding = None
+    if student.opt_in_biometric:
+        if photo is None:
+            raise HTTPException(status_code=400, detail="A photo is required to opt in to biometrics")
+        # before taking a DB connection, so a busy model never holds one
+        try:
+            embedding = run_inference(lambda: get_embedding(bytes_to_cv2(photo[0])))
+        except InferenceBusy:
+            raise
+        except Exception as e:
+            print(f"ERROR with face analysis: {e}")
+            raise HTTPException(status_code=500, detail="Error with face analysis")
 
     conn = get_db_connection()
     try:
         cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO STUDENT (PID, name, email, degree_name, degree_type, opt_in_biometric)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            RETURNING PID, name, email, degree_name, degree_type, opt_in_biometric
-            """,
-            (student.PID, student.name, student.email, student.degree_name, student.degree_type, student.opt_in_biometric),
-        )
-        row = cur.fetchone()
-        if student.opt_in_biometric:
-            storage_uri = store_face(student)
-            embedding = get_embedding(storage_uri)
+        with stage("student_insert"):
             cur.execute(
                 """
-                INSERT INTO FACE_IMAGE (SPID, storage_uri, embedding)
-                VALUES (%s, %s, %s)
+                INSERT INTO STUDENT (PID, name, email, degree_name, degree_type, opt_in_biometric)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                RETURNING PID, name, email, degree_name, degree_type, opt_in_biometric
                 """,
-                (student.PID, storage_uri, embedding)
+                (student.PID, student.name, student.email, student.degree_name, student.degree_type, student.opt_in_biometric),
             )
-        conn.commit()
+            row = cur.fetchone()
+        if student.opt_in_biometric:
+            image_bytes, file_ext = photo
+            storage_uri = store_face_bytes(student.PID, image_bytes, file_ext)
+            with stage("face_insert"):
+                cur.execute(
+                    """
+                    INSERT INTO FACE_IMAGE (SPID, storage_uri, embedding)
+                    VALUES (%s, %s, %s)
+                    RETURNING face_id, (SELECT ceremony_id FROM DEGREE WHERE degree_name = %s)
+                    """,
+                    (student.PID, storage_uri, np.asarray(embedding, dtype=np.float32), student.degree_name)
+                )
+                face_id, ceremony_id = cur.fetchone()
+        with stage("commit"):
+            conn.commit()
+        if student.opt_in_biometric and gallery_ready():
+            gallery.add(face_id, student.PID, ceremony_id, embedding)
         return {
             "PID": row[0], "name": row[1], "email": row[2],
             "degree_name": row[3], "degree_type": row[4],
@@ -64,9 +172,6 @@ def insert_student(student: StudentIn):
         conn.rollback()
         print("ERROR: " + str(e))
         raise HTTPException(status_code=400, detail=str(e))
-    except AssertionError:
-        conn.rollback()
-        raise HTTPException(status_code=500, detail="Error with face analysis")
     except Exception as e:
         conn.rollback()
         print(f"An error occurred: {e}")
@@ -74,6 +179,47 @@ def insert_student(student: StudentIn):
     finally:
         cur.close(); conn.close()
 
+@router.post("/import")
+def import_students(roster: UploadFile = File(...), photos: Optional[UploadFile] = File(None)):
+    """
+    Bulk enrollment from a CSV or JSONL roster (STUDENT columns plus a `photo`
+    file name) and a zip of the photos. Rows are loaded in batches; students
+    whose PID already exists are skipped, so a failed import can be re-sent.
+    Returns counts and the per-row failures.
+    """
+    try:
+        source = PhotoSource(photos.file if photos else None)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="photos must be a zip archive")
+
+    try:
+        records = iter_roster(roster.file, roster_format(roster.filename or ""))
+        # connections are checked out per batch write, not for the whole import
+        report = import_roster(get_db_connection, records, source, embed=_embed_for_import)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Could not read roster: {e}")
+    except psycopg2.Error as e:
+        print("ERROR: " + str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        source.close()
+
+    if report["faces"] and gallery_ready():
+        gallery.load()
+    return report
+
+def _embed_for_import(images):
+    # share the inference executor with live requests, waiting out short bursts;
+    # imports (all of them together) hold at most IMPORT_INFERENCE_CONCURRENCY workers
+    with _import_inference_slots:
+        for attempt in range(5):
+            try:
+                return run_inference(get_embeddings, images, timeout=IMPORT_INFERENCE_DEADLINE)
+            except InferenceBusy:
+                if attempt == 4:
+                    raise
+                time.sleep(2 ** attempt)
+
 @router.put("/{pid}", response_model=StudentOut)
 def update_student(pid: str, student: StudentIn):
     conn = get_db_connection()
@@ -116,55 +262,266 @@ def delete_student(pid: str):
     cur.close(); conn.close()
     if not deleted:
         raise HTTPException(status_code=404, detail="Student not found")
+    if gallery_ready():
+        gallery.remove_student(pid)
     return {"status": "deleted", "PID": pid}
 
-@router.post("/match", response_model=StudentOut)
+@router.post("/match", response_model=MatchOut)
 def get_match(b: MatchIn):
-    
-    conn = get_db_connection()
-    try:
-        im = base64_to_cv2(b.photo)
-        embedding = get_embedding(im)
-        embedding_str = "[" + ",".join(map(str, embedding)) + "]"
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT
-                face_id,
-                SPID,
-                storage_uri,
-                embedding <=> %s::vector AS distance
-            FROM FACE_IMAGE
-            ORDER BY embedding <=> %s::vector
-            LIMIT 1;
-            """, (embedding_str, embedding_str))
-        student_pid = cur.fetchone()[1]
+    """
+    Returns the nearest enrolled students with their distances. `student` is
+    only set when status is "match"; "no_match" (nearest too far) and
+    "ambiguous" (runner-up too close) are left to the operator.
+    """
+    return _match_photo(lambda: base64_to_cv2(b.photo), b.ceremony_id, b.ef_search, b.probes, b.cropped, b.top_k)
+
+@router.post("/match/upload", response_model=MatchOut)
+def get_match_upload(
+    photo: UploadFile = File(...),
+    ceremony_id: Optional[int] = Form(None),
+    ef_search: Optional[int] = Form(None),
+    probes: Optional[int] = Form(None),
+    cropped: bool = Form(False),
+    top_k: Optional[int] = Form(None),
+):
+    """
+    multipart/form-data variant of POST /api/students/match
+    """
+    image_bytes, _ = read_upload(photo)
+    return _match_photo(lambda: bytes_to_cv2(image_bytes), ceremony_id, ef_search, probes, cropped, top_k)
+
+def _detector_size(cropped):
+    # kiosk face crops only need a small detector pass to find the landmarks
+    return FACE_CROP_DET_SIZE if cropped else None
+
+def _top_k(top_k):
+    top_k = top_k or MATCH_TOP_K
+    if top_k < 1 or top_k > MATCH_TOP_K_MAX:
+        raise HTTPException(status_code=400, detail=f"top_k must be between 1 and {MATCH_TOP_K_MAX}")
+    return top_k
+
+def _student_out(r):
+    return {
+        "PID": r[0],
+        "name": r[1],
+        "email": r[2],
+        "degree_name": r[3],
+        "degree_type": r[4],
+        "opt_in_biometric": r[5],
+    }
+
+def _gallery_k(top_k):
+    return max(faces_to_fetch(top_k), FACE_RERANK_CANDIDATES) if gallery.quantized else faces_to_fetch(top_k)
+
+def _gallery_rows(cur, queries, hits):
+    """
+    (idx, PID, name, email, degree_name, degree_type, opt_in_biometric, distance)
+    rows for each query's gallery hits, nearest first. Hits from a float16 /
+    int8 gallery are reranked by their full-precision FACE_IMAGE distance in
+    the same query that fetches the students.
+    """
+    if gallery.quantized:
+        with stage("rerank"):
+            cur.execute(
+                RERANK_SQL,
+                {
+                    "idx": [i for i, _ in queries],
+                    "embeddings": [np.asarray(e, dtype=np.float32) for _, e in queries],
+                    "candidate_idx": [i for (i, _), h in zip(queries, hits) for _ in h],
+                    "candidate_face_ids": [face_id for h in hits for face_id, _, _ in h],
+                },
+            )
+            return cur.fetchall()
+
+    with stage("student_lookup"):
         cur.execute(
             """
             SELECT PID, name, email, degree_name, degree_type, opt_in_biometric
             FROM STUDENT
-            WHERE PID = %s
+            WHERE PID = ANY(%s)
             """,
-            (student_pid,)
+            (list({spid for h in hits for _, spid, _ in h}),)
         )
-        r = cur.fetchone()
+        students = {r[0]: r for r in cur.fetchall()}
+    return [
+        (i,) + students[spid][:6] + (distance,)
+        for (i, _), h in zip(queries, hits)
+        for _, spid, distance in h
+        if spid in students
+    ]
+
+def _record_outcome(result, source):
+    if result["distance"] is not None:
+        MATCH_DISTANCE.labels(source).observe(result["distance"])
+    MATCH_OUTCOMES.labels(result["status"]).inc()
+    return result
+
+def _match_photo(decode, ceremony_id, ef_search, probes, cropped=False, top_k=None):
+    top_k = _top_k(top_k)
+    try:
+        embedding = run_inference(lambda: get_embedding(decode(), det_size=_detector_size(cropped)))
+    except InferenceBusy:
+        raise
+    except Exception as e:
+        print("ERROR: " + str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        if gallery_ready():
+            fetched = _gallery_k(top_k)
+            with stage("gallery_search"):
+                hits = gallery.search(embedding, k=fetched, ceremony_id=ceremony_id)
+            rows = [r[1:] for r in _gallery_rows(cur, [(0, embedding)], [hits])]
+            source = "gallery"
+        else:
+            # nearest faces and their students in one statement; the embedding is
+            # bound once and the distance is computed once, then ordered by alias
+            fetched = faces_to_fetch(top_k)
+            with stage("vector_search"):
+                apply_search_params(cur, ef_search, probes, filtered=ceremony_id is not None)
+                cur.execute(
+                    f"""
+                    SELECT s.PID, s.name, s.email, s.degree_name, s.degree_type, s.opt_in_biometric, m.distance
+                    FROM ({nearest_faces_sql("%(embedding)s::vector")}) m
+                    JOIN STUDENT s ON s.PID = m.SPID
+                    ORDER BY m.distance
+                    """,
+                    search_params(ceremony_id, fetched, embedding=np.asarray(embedding, dtype=np.float32)),
+                )
+                rows = cur.fetchall()
+            source = "pgvector"
+        nearest, runner_up_floor = nearest_students([(r[0], r[6]) for r in rows], top_k, fetched)
+        students = {r[0]: _student_out(r) for r in rows}
+        if not nearest:
+            raise HTTPException(status_code=404, detail="No enrolled faces to match against")
         conn.commit()
-        return {
-            "PID": r[0],
-            "name": r[1],
-            "email": r[2],
-            "degree_name": r[3],
-            "degree_type": r[4],
-            "opt_in_biometric": r[5],
-        }
-        
+        result = match_outcome([(students[pid], d) for pid, d in nearest if pid in students], top_k, runner_up_floor)
+        return _record_outcome(result, source)
+
+    except HTTPException:
+        conn.rollback()
+        raise
     except psycopg2.Error as e:
         conn.rollback()
         print("ERROR: " + str(e))
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        conn.rollback
+        conn.rollback()
         print("ERROR: " + str(e))
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cur.close(); conn.close()
+
+@router.post("/match/batch", response_model=list[MatchResultOut])
+def get_match_batch(b: MatchBatchIn):
+    """
+    Matches several frames at once: one recognizer pass for all detected
+    faces and one query that resolves every frame's nearest neighbours.
+    Each result carries the same status / candidates as /match.
+    """
+    _check_batch_size(len(b.photos))
+    return _match_batch(b.photos, base64_to_cv2, b.ceremony_id, b.ef_search, b.probes, b.cropped, b.top_k)
+
+@router.post("/match/batch/upload", response_model=list[MatchResultOut])
+def get_match_batch_upload(
+    photos: list[UploadFile] = File(...),
+    ceremony_id: Optional[int] = Form(None),
+    ef_search: Optional[int] = Form(None),
+    probes: Optional[int] = Form(None),
+    cropped: bool = Form(False),
+    top_k: Optional[int] = Form(None),
+):
+    """
+    multipart/form-data variant of POST /api/students/match/batch
+    (repeat the photos field once per frame)
+    """
+    _check_batch_size(len(photos))
+    return _match_batch([read_upload(p)[0] for p in photos], bytes_to_cv2, ceremony_id, ef_search, probes, cropped, top_k)
+
+def _check_batch_size(n):
+    if not n:
+        raise HTTPException(status_code=400, detail="No photos provided")
+    if n > MATCH_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {MATCH_BATCH_MAX} photos per batch")
+
+def _match_batch(photos, decode, ceremony_id, ef_search, probes, cropped=False, top_k=None):
+    top_k = _top_k(top_k)
+    results = [{"index": i} for i in range(len(photos))]
+    images, owners = [], []
+    for i, photo in enumerate(photos):
+        try:
+            images.append(decode(photo))
+            owners.append(i)
+        except ValueError as e:
+            results[i]["error"] = str(e)
+
+    try:
+        embeddings = run_inference(get_embeddings, images, det_size=_detector_size(cropped)) if images else []
+    except InferenceBusy:
+        raise
+    except Exception as e:
+        print("ERROR: " + str(e))
+        raise HTTPException(status_code=500, detail="Error with face analysis")
+
+    queries = []
+    for i, embedding in zip(owners, embeddings):
+        if embedding is None:
+            results[i]["error"] = "No face detected in image"
+        else:
+            queries.append((i, embedding))
+    if not queries:
+        return results
+
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        if gallery_ready():
+            fetched = _gallery_k(top_k)
+            with stage("gallery_search"):
+                hits = gallery.search_many([e for _, e in queries], k=fetched, ceremony_id=ceremony_id)
+            rows = _gallery_rows(cur, queries, hits)
+            source = "gallery"
+        else:
+            fetched = faces_to_fetch(top_k)
+            with stage("vector_search"):
+                apply_search_params(cur, ef_search, probes, filtered=ceremony_id is not None)
+                cur.execute(
+                    f"""
+                    SELECT q.idx, s.PID, s.name, s.email, s.degree_name, s.degree_type, s.opt_in_biometric, m.distance
+                    FROM unnest(%(idx)s::int[], %(embeddings)s::vector[]) AS q(idx, emb)
+                    CROSS JOIN LATERAL ({nearest_faces_sql("q.emb")}) m
+                    JOIN STUDENT s ON s.PID = m.SPID
+                    ORDER BY q.idx, m.distance
+                    """,
+                    search_params(
+                        ceremony_id,
+                        fetched,
+                        idx=[i for i, _ in queries],
+                        embeddings=[np.asarray(e, dtype=np.float32) for _, e in queries],
+                    ),
+                )
+                rows = cur.fetchall()
+            source = "pgvector"
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        print("ERROR: " + str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        cur.close(); conn.close()
+
+    # frame index -> (SPID, distance) pairs, nearest first
+    faces = {i: [] for i, _ in queries}
+    for r in rows:
+        faces[r[0]].append((r[1], r[7]))
+    nearest = {i: nearest_students(f, top_k, fetched) for i, f in faces.items()}
+    students = {r[1]: _student_out(r[1:]) for r in rows}
+    for i, (n, runner_up_floor) in nearest.items():
+        if not n:
+            results[i]["error"] = "No enrolled faces to match against"
+            continue
+        result = match_outcome([(students[pid], d) for pid, d in n if pid in students], top_k, runner_up_floor)
+        results[i].update(_record_outcome(result, source))
+    return results
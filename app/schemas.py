@@ -44,15 +44,50 @@ class StaffOut(StaffIn):
 
 class MatchIn(BaseModel):
     photo: str
+    ceremony_id: Optional[int] = None  # only match graduates of this ceremony
+    ef_search: Optional[int] = None  # HNSW candidate list size for this query
+    probes: Optional[int] = None     # IVFFlat lists to probe for this query
+    cropped: bool = False            # photo is a kiosk face crop; detect at FACE_CROP_DET_SIZE
+    top_k: Optional[int] = None      # candidates to return (default MATCH_TOP_K)
+
+class MatchBatchIn(BaseModel):
+    photos: list[str]
+    ceremony_id: Optional[int] = None
+    ef_search: Optional[int] = None
+    probes: Optional[int] = None
+    cropped: bool = False
+    top_k: Optional[int] = None
+
+class MatchCandidateOut(BaseModel):
+    student: StudentOut
+    distance: float
+
+class MatchOut(BaseModel):
+    status: str                            # "match", "no_match" or "ambiguous"
+    student: Optional[StudentOut] = None   # the accepted student, only when status is "match"
+    distance: Optional[float] = None       # nearest candidate's cosine distance
+    candidates: list[MatchCandidateOut] = []
+
+class MatchResultOut(BaseModel):
+    index: int
+    status: Optional[str] = None
+    student: Optional[StudentOut] = None
+    distance: Optional[float] = None
+    candidates: list[MatchCandidateOut] = []
+    error: Optional[str] = None
 
 class QueueIn(BaseModel):
     SPID: str
 
 class DequeueIn(BaseModel):
     ceremony_id: int
+    count: int = 1  # claim this many students at once (announcer pre-fetch)
 
 class ViewQueueIn(BaseModel):
     ceremony_id: int
+    limit: Optional[int] = None           # page size per list; None returns everything
+    pending_after: Optional[str] = None   # pending_next cursor from the previous page
+    called_after: Optional[str] = None    # called_next cursor from the previous page
 
 # -------- NEW auth / user models (append only) --------
 
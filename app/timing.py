@@ -0,0 +1,81 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import Histogram
+
+# Per-stage timing for the match / enrollment pipeline. Every stage is observed
+# into STAGE_SECONDS; inside a request its time is also summed per stage and
+# sent back in a Server-Timing header, so a slow kiosk match can be broken down
+# (decode, model load, detection, recognition, search, lookup) from the browser.
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") == "1"
+
+STAGE_SECONDS = Histogram(
+    "request_stage_seconds",
+    "Time spent in each stage of the face match / enrollment pipeline",
+    ["stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+# {stage: seconds} for the current request. Sync routes and the inference
+# workers run in copies of the request context that share this same dict.
+_request_stages: ContextVar[Optional[dict]] = ContextVar("request_stages", default=None)
+
+
+def record(name, seconds):
+    STAGE_SECONDS.labels(name).observe(seconds)
+    stages = _request_stages.get()
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name):
+    """
+    times the enclosed block as `name`; repeated stages in one request
+    (e.g. per-frame decode in a batch) add up
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def server_timing_header(stages, total):
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in stages.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware that gives each HTTP request its own stage dict and adds a
+    Server-Timing header to responses that recorded any stages.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not SERVER_TIMING:
+            return await self.app(scope, receive, send)
+
+        stages = {}
+        token = _request_stages.set(stages)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and stages:
+                header = server_timing_header(stages, time.perf_counter() - start)
+                message = dict(message, headers=list(message.get("headers", [])) + [
+                    (b"server-timing", header.encode("latin-1")),
+                ])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stages.reset(token)
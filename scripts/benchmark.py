@@ -0,0 +1,247 @@
+import argparse
+import asyncio
+import base64
+import glob
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import httpx
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from app.main import app
+from app.db import get_db_connection
+
+'''
+Load-tests the check-in hot paths against the real ASGI app (in-process, over
+httpx's ASGI transport) and a local Postgres + pgvector, and writes the results
+as JSON
+
+    python scripts/benchmark.py --concurrency 1,8,32 --requests 300 --output bench.json
+    python scripts/benchmark.py --load-students 10000 --scenarios match,queue_view
+    python scripts/benchmark.py --compare bench.json     # exit 1 if p95 regressed
+
+--load-students replaces the database contents with scripts/loadSynthetic.py data.
+'''
+
+BASE_URL = "http://bench"
+SCENARIOS = ["match", "queue_push", "queue_pop", "queue_view", "report_charts"]
+# Statuses that are a normal outcome for the scenario, not an error
+EXPECTED_STATUS = {
+    "match": {200},
+    "queue_push": {200, 409},
+    "queue_pop": {200, 404},
+    "queue_view": {200},
+    "report_charts": {200},
+}
+
+
+# ---------- Fixtures ----------
+
+def load_fixtures(photo_dir):
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT ceremony_id FROM CEREMONY ORDER BY ceremony_id")
+        ceremonies = [r[0] for r in cur.fetchall()]
+        cur.execute(
+            """
+            SELECT s.PID FROM STUDENT s
+            JOIN DEGREE d ON d.degree_name = s.degree_name
+            WHERE d.ceremony_id IS NOT NULL
+            """
+        )
+        pids = [r[0] for r in cur.fetchall()]
+        cur.execute("SELECT COUNT(*) FROM STUDENT")
+        students = cur.fetchone()[0]
+        cur.execute("SELECT COUNT(*) FROM FACE_IMAGE")
+        faces = cur.fetchone()[0]
+        cur.close()
+        conn.commit()
+    finally:
+        conn.close()
+
+    photos = []
+    for path in sorted(glob.glob(os.path.join(photo_dir, "*.jpg")) + glob.glob(os.path.join(photo_dir, "*.png"))):
+        with open(path, "rb") as f:
+            ext = "png" if path.endswith(".png") else "jpeg"
+            photos.append(f"data:image/{ext};base64,{base64.b64encode(f.read()).decode()}")
+
+    if not ceremonies or not pids:
+        raise SystemExit("No ceremonies/students found; run with --load-students N first")
+    if not photos:
+        raise SystemExit(f"No photos found in {photo_dir}")
+    return {"ceremonies": ceremonies, "pids": pids, "photos": photos, "students": students, "faces": faces}
+
+
+def request_factory(name, fx, view_limit):
+    """Returns a function producing (method, path, kwargs) for one request"""
+    if name == "match":
+        return lambda: ("POST", "/api/students/match", {"json": {"photo": random.choice(fx["photos"])}})
+    if name == "queue_push":
+        return lambda: ("POST", "/api/queue/push", {"json": {"SPID": random.choice(fx["pids"])}})
+    if name == "queue_pop":
+        return lambda: ("POST", "/api/queue/pop", {"json": {"ceremony_id": random.choice(fx["ceremonies"])}})
+    if name == "queue_view":
+        return lambda: ("POST", "/api/queue/view", {"json": {"ceremony_id": random.choice(fx["ceremonies"]), "limit": view_limit}})
+    if name == "report_charts":
+        return lambda: ("GET", "/api/reports/charts", {})
+    raise ValueError(f"Unknown scenario '{name}'")
+
+
+# ---------- Runner ----------
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    # nearest-rank
+    k = max(math.ceil(p / 100 * len(sorted_values)), 1) - 1
+    return sorted_values[k]
+
+
+async def run_scenario(client, name, make_request, concurrency, total, warmup):
+    for _ in range(warmup):
+        method, path, kwargs = make_request()
+        await client.request(method, path, **kwargs)
+
+    latencies, statuses = [], Counter()
+    remaining = [total]
+
+    async def worker():
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            method, path, kwargs = make_request()
+            start = time.perf_counter()
+            try:
+                resp = await client.request(method, path, **kwargs)
+                statuses[resp.status_code] += 1
+            except httpx.HTTPError:
+                statuses["exception"] += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 3) if v is not None else None
+    errors = sum(n for status, n in statuses.items() if status not in EXPECTED_STATUS[name])
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "mean": ms(sum(latencies) / len(latencies)) if latencies else None,
+            "max": ms(latencies[-1]) if latencies else None,
+        },
+        "status_codes": {str(k): v for k, v in sorted(statuses.items(), key=lambda kv: str(kv[0]))},
+    }
+
+
+async def run(args, fx):
+    transport = httpx.ASGITransport(app=app)
+    results = []
+    # ASGITransport does not send lifespan events; run startup/shutdown ourselves
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url=BASE_URL, timeout=args.timeout) as client:
+            for name in args.scenarios:
+                make_request = request_factory(name, fx, args.view_limit)
+                for concurrency in args.concurrency:
+                    result = await run_scenario(client, name, make_request, concurrency, args.requests, args.warmup)
+                    lat = result["latency_ms"]
+                    print(
+                        f"{name:<14} c={concurrency:<3} {result['throughput_rps']:>8} req/s  "
+                        f"p50={lat['p50']}ms p95={lat['p95']}ms p99={lat['p99']}ms errors={result['errors']}",
+                        file=sys.stderr,
+                    )
+                    results.append(result)
+    return results
+
+
+def compare(results, baseline_path, tolerance):
+    """Prints p95 changes against a previous run; returns True if any regressed"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["scenario"], r["concurrency"]): r for r in json.load(f)["results"]}
+    regressed = False
+    for r in results:
+        before = baseline.get((r["scenario"], r["concurrency"]))
+        if not before or not before["latency_ms"]["p95"] or r["latency_ms"]["p95"] is None:
+            continue
+        change = r["latency_ms"]["p95"] / before["latency_ms"]["p95"] - 1
+        flag = "REGRESSION" if change > tolerance else "ok"
+        regressed |= change > tolerance
+        print(f"{r['scenario']:<14} c={r['concurrency']:<3} p95 {before['latency_ms']['p95']} -> "
+              f"{r['latency_ms']['p95']}ms ({change:+.1%}) {flag}", file=sys.stderr)
+    return regressed
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the check-in hot paths")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and concurrency level")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--view-limit", type=int, default=50, help="page size for queue_view")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--photos", default=os.path.join(REPO_DIR, "scripts", "example_images"))
+    parser.add_argument("--load-students", type=int, default=None, help="reload a synthetic dataset of this size first")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="write JSON here instead of stdout")
+    parser.add_argument("--compare", default=None, help="previous JSON output to compare p95 against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed p95 increase for --compare")
+    args = parser.parse_args()
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    args.concurrency = [int(c) for c in args.concurrency.split(",")]
+
+    if args.load_students:
+        from loadSynthetic import load
+        load(args.load_students, 4, 0.8, 0.3, args.seed, reset=True)
+
+    random.seed(args.seed)
+    fx = load_fixtures(args.photos)
+    results = asyncio.run(run(args, fx))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "students": fx["students"],
+            "faces": fx["faces"],
+            "requests_per_level": args.requests,
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.compare and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,11 @@ import json
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.report_data import create_report_summary
 
 # NEW: for password hashing
 from passlib.hash import bcrypt
@@ -36,6 +41,17 @@ def load_db_config():
 # Load configuration from JSON file
 DB_CONFIG = load_db_config()
 
+# Approximate nearest neighbour index on FACE_IMAGE.embedding ("hnsw", "ivfflat" or "none")
+FACE_INDEX_NAME = "face_image_embedding_idx"
+FACE_INDEX_METHOD = os.getenv("FACE_INDEX_METHOD", "hnsw").lower()
+FACE_INDEX_HNSW_M = int(os.getenv("FACE_INDEX_HNSW_M", "16"))
+FACE_INDEX_HNSW_EF_CONSTRUCTION = int(os.getenv("FACE_INDEX_HNSW_EF_CONSTRUCTION", "64"))
+FACE_INDEX_IVFFLAT_LISTS = os.getenv("FACE_INDEX_IVFFLAT_LISTS")  # default: rows / 1000
+# "vector" indexes the float32 column as-is; "halfvec" indexes embedding::halfvec(512),
+# half the size, and the app reranks its candidates at full precision
+# (pgvector >= 0.7; set the same FACE_INDEX_PRECISION for the API)
+FACE_INDEX_PRECISION = os.getenv("FACE_INDEX_PRECISION", "vector").lower()
+
 
 def create_database():
     """Create the database if it doesn't exist"""
@@ -154,6 +170,8 @@ def create_tables():
             );
         """)
         print("✓ FACE_IMAGE table created.")
+
+        create_vector_index(cursor)
         
         # Create MANAGES relationship table
         cursor.execute("""
@@ -181,7 +199,69 @@ def create_tables():
             );
         """)
         print("✓ QUEUED table created.")
+
+        # Serves the per-ceremony pending/called lists and the queue pop in time order
+        cursor.execute("""
+            CREATE INDEX queued_ceremony_status_time_idx
+            ON QUEUED (ceremony_id, status, time_queued, SPID);
+        """)
+
+        # Push QUEUED changes to the API's /api/queue/stream listeners
+        cursor.execute("""
+            CREATE OR REPLACE FUNCTION notify_queued_change() RETURNS trigger AS $$
+            DECLARE
+                rec QUEUED%ROWTYPE;
+                s RECORD;
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    rec := OLD;
+                ELSE
+                    rec := NEW;
+                END IF;
+                SELECT name, degree_name, degree_type INTO s FROM STUDENT WHERE PID = rec.SPID;
+                PERFORM pg_notify('queued_changes', json_build_object(
+                    'op', TG_OP,
+                    'ceremony_id', rec.ceremony_id,
+                    'PID', rec.SPID,
+                    'status', rec.status,
+                    'time_queued', rec.time_queued,
+                    'name', s.name,
+                    'degree_name', s.degree_name,
+                    'degree_type', s.degree_type
+                )::text);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            CREATE TRIGGER queued_notify
+            AFTER INSERT OR UPDATE OR DELETE ON QUEUED
+            FOR EACH ROW EXECUTE FUNCTION notify_queued_change();
+        """)
+        print("✓ QUEUED change notifications enabled.")
         
+        # Bumped on every write to the reported tables; the API caches rendered
+        # reports per value. A sequence never blocks concurrent writers.
+        cursor.execute("""
+            CREATE SEQUENCE IF NOT EXISTS report_data_version;
+
+            CREATE OR REPLACE FUNCTION bump_report_data_version() RETURNS trigger AS $$
+            BEGIN
+                PERFORM nextval('report_data_version');
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+        """)
+        for table in ["CEREMONY", "DEGREE", "STUDENT", "QUEUED"]:
+            cursor.execute(sql.SQL("""
+                CREATE TRIGGER {} AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {}
+                FOR EACH STATEMENT EXECUTE FUNCTION bump_report_data_version();
+            """).format(sql.Identifier(f"{table.lower()}_report_version"), sql.Identifier(table.lower())))
+        print("✓ Report data version triggers created.")
+
+        # Precomputed report counts, read when REPORT_REFRESH_MODE is not "live"
+        create_report_summary(cursor)
+        print("✓ report_summary materialized view created.")
+
         conn.commit()
         cursor.close()
         conn.close()
@@ -191,6 +271,76 @@ def create_tables():
         print(f"✗ Error creating tables: {e}")
 
 
+def create_vector_index(cursor, method=None, lists=None, precision=None, concurrently=False):
+    """
+    (Re)create the ANN index used by the <=> (cosine distance) match query.
+    HNSW can be built on an empty table; IVFFlat picks its centroids from the
+    rows present at build time, so rebuild it once the faces are loaded.
+    Switching precision needs no data migration: the halfvec index is an
+    expression index over the existing float32 column.
+
+    By default the old index is dropped and the new one built in the caller's
+    transaction, which locks FACE_IMAGE (matches included) until it commits:
+    fine at setup, not on a live database. concurrently=True needs an
+    autocommit connection; it builds with CREATE INDEX CONCURRENTLY under a
+    temporary name, then drops the old index and renames the new one into
+    place, so matches keep using the old index during the build.
+    """
+    method = (method or FACE_INDEX_METHOD).lower()
+    precision = (precision or FACE_INDEX_PRECISION).lower()
+
+    if precision == "vector":
+        key = sql.SQL("embedding vector_cosine_ops")
+    elif precision == "halfvec":
+        key = sql.SQL("(embedding::halfvec(512)) halfvec_cosine_ops")
+    else:
+        raise ValueError(f"Unknown FACE_INDEX_PRECISION '{precision}' (expected vector or halfvec)")
+    if method not in ("hnsw", "ivfflat", "none"):
+        raise ValueError(f"Unknown FACE_INDEX_METHOD '{method}' (expected hnsw, ivfflat or none)")
+
+    drop = sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}" if concurrently else "DROP INDEX IF EXISTS {}")
+    create = sql.SQL("CREATE INDEX CONCURRENTLY {}" if concurrently else "CREATE INDEX {}")
+    build_name = FACE_INDEX_NAME + "_new" if concurrently else FACE_INDEX_NAME
+    # a failed concurrent build leaves an INVALID index behind under the temporary name
+    cursor.execute(drop.format(sql.Identifier(build_name)))
+
+    if method == "none":
+        if concurrently:
+            cursor.execute(drop.format(sql.Identifier(FACE_INDEX_NAME)))
+        print("✓ FACE_IMAGE embedding index disabled.")
+        return
+    if method == "hnsw":
+        cursor.execute(sql.SQL("""
+            {} ON FACE_IMAGE
+            USING hnsw ({})
+            WITH (m = {}, ef_construction = {});
+        """).format(
+            create.format(sql.Identifier(build_name)),
+            key,
+            sql.Literal(FACE_INDEX_HNSW_M),
+            sql.Literal(FACE_INDEX_HNSW_EF_CONSTRUCTION),
+        ))
+        print(f"✓ FACE_IMAGE HNSW {precision} index created (m={FACE_INDEX_HNSW_M}, ef_construction={FACE_INDEX_HNSW_EF_CONSTRUCTION}).")
+    else:
+        if lists is None and FACE_INDEX_IVFFLAT_LISTS:
+            lists = int(FACE_INDEX_IVFFLAT_LISTS)
+        if lists is None:
+            cursor.execute("SELECT COUNT(*) FROM FACE_IMAGE;")
+            lists = max(cursor.fetchone()[0] // 1000, 1)
+        cursor.execute(sql.SQL("""
+            {} ON FACE_IMAGE
+            USING ivfflat ({})
+            WITH (lists = {});
+        """).format(create.format(sql.Identifier(build_name)), key, sql.Literal(lists)))
+        print(f"✓ FACE_IMAGE IVFFlat {precision} index created (lists={lists}).")
+
+    if concurrently:
+        cursor.execute(drop.format(sql.Identifier(FACE_INDEX_NAME)))
+        cursor.execute(sql.SQL("ALTER INDEX {} RENAME TO {}").format(
+            sql.Identifier(build_name), sql.Identifier(FACE_INDEX_NAME),
+        ))
+
+
 # ---------- NEW: USER_ACCOUNT + seed first admin ----------
 
 def create_user_table_and_seed_admin():
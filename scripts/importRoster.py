@@ -0,0 +1,69 @@
+import argparse
+import csv
+import time
+
+from createDB import psycopg2, DB_CONFIG
+from app.roster import IMPORT_BATCH_SIZE, IMPORT_WORKERS, PhotoSource, import_roster, iter_roster, roster_format
+
+'''
+Bulk-enrolls a graduating class from a roster file and its photos
+
+    python scripts/importRoster.py roster.csv --photos photos/
+    python scripts/importRoster.py roster.jsonl --photos photos.zip --workers 4 --failures failed.csv
+
+The roster has the STUDENT columns (PID, name, email, degree_name, degree_type,
+opt_in_biometric) plus `photo`, a file name in the photo directory or archive.
+Every batch is committed as it goes and existing PIDs are skipped, so an
+interrupted import can simply be run again.
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import students and face embeddings")
+    parser.add_argument("roster", help="CSV or JSONL roster")
+    parser.add_argument("--photos", default=None, help="photo directory or zip archive")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=IMPORT_WORKERS, help="embedding workers")
+    parser.add_argument("--failures", default=None, help="write per-row failures to this CSV")
+    args = parser.parse_args()
+
+    photos = PhotoSource(args.photos)
+    start = time.perf_counter()
+
+    def progress(report):
+        done = report["imported"] + report["skipped"] + report["failed"]
+        print(f"  {done} rows ({report['imported']} imported, {report['skipped']} skipped, "
+              f"{report['failed']} failed) {time.perf_counter() - start:.1f}s")
+
+    try:
+        with open(args.roster, "rb") as f:
+            report = import_roster(
+                lambda: psycopg2.connect(**DB_CONFIG),
+                iter_roster(f, roster_format(args.roster)),
+                photos,
+                batch_size=args.batch_size,
+                workers=args.workers,
+                progress=progress,
+            )
+    finally:
+        photos.close()
+
+    print(f"✓ Imported {report['imported']} students ({report['faces']} faces) in {time.perf_counter() - start:.1f}s")
+    print(f"  skipped {report['skipped']} already enrolled, {report['failed']} failed")
+
+    if report["failures"]:
+        if args.failures:
+            with open(args.failures, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=["row", "PID", "error"])
+                writer.writeheader()
+                writer.writerows(report["failures"])
+            print(f"  failures written to {args.failures}")
+        else:
+            for failure in report["failures"][:20]:
+                print(f"  row {failure['row']} ({failure['PID']}): {failure['error']}")
+            if report["failed"] > 20:
+                print(f"  ... and {report['failed'] - 20} more (use --failures to save them all)")
+
+
+if __name__ == "__main__":
+    main()
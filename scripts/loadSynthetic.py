@@ -0,0 +1,260 @@
+import argparse
+import csv
+import io
+import random
+import struct
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from createDB import psycopg2, DB_CONFIG, FACE_INDEX_METHOD, FACE_INDEX_NAME, create_vector_index
+
+'''
+Fills an empty (or --reset) database with a synthetic graduating class for load
+testing. Every table is loaded with COPY; FACE_IMAGE uses binary COPY so the
+512 floats per row are never formatted as text.
+
+    python scripts/loadSynthetic.py --students 10000
+    python scripts/loadSynthetic.py --students 100000 --ceremonies 8 --reset --seed 7
+'''
+
+EMBEDDING_SIZE = 512
+CHUNK_ROWS = 10000
+
+COLLEGES = {
+    "Engineering": [
+        "Computer Science", "Computer Engineering", "Electrical Engineering", "Mechanical Engineering",
+        "Industrial & Systems Engineering", "Chemical Engineering", "Civil Engineering",
+        "Aerospace Engineering", "Materials Science & Engineering",
+    ],
+    "Science": [
+        "Biology", "Chemistry", "Physics", "Mathematics", "Statistics", "Biochemistry",
+        "Neuroscience", "Geosciences",
+    ],
+    "Business": [
+        "Accounting", "Finance", "Marketing", "Management", "Business Information Technology", "Economics",
+    ],
+    "Arts": [
+        "English", "History", "Philosophy", "Political Science", "Sociology", "Psychology",
+        "Communication", "Studio Art", "Music",
+    ],
+}
+FIRST_NAMES = [
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+    "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen",
+    "Wei", "Priya", "Carlos", "Aisha", "Mohammed", "Yuki", "Olga", "Kwame", "Sofia", "Mateo",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+    "Lee", "Chen", "Patel", "Nguyen", "Kim", "Okafor", "Ivanova", "Tanaka", "Silva", "Cohen",
+]
+DEGREE_TYPES = (["BS", "MS", "PHD"], [0.7, 0.22, 0.08])
+QUEUE_STATUSES = (["pending", "called"], [0.6, 0.4])
+
+
+# ---------- COPY helpers ----------
+
+def copy_rows(cursor, table, columns, rows):
+    """COPY rows (any iterable of tuples) into table as CSV, CHUNK_ROWS at a time"""
+    rows = iter(rows)
+    total = 0
+    while True:
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        n = 0
+        for row in rows:
+            writer.writerow(row)
+            n += 1
+            if n == CHUNK_ROWS:
+                break
+        if not n:
+            return total
+        buf.seek(0)
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+        total += n
+
+
+def _binary_text(value):
+    data = value.encode("utf-8")
+    return struct.pack(">i", len(data)) + data
+
+
+def _binary_vector(embedding):
+    # pgvector's binary form: int16 dimensions, int16 unused, float4 values (big-endian)
+    data = struct.pack(">hh", len(embedding), 0) + np.asarray(embedding, dtype=">f4").tobytes()
+    return struct.pack(">i", len(data)) + data
+
+
+def copy_face_images(cursor, rows):
+    """Binary COPY of (SPID, storage_uri, embedding) rows into FACE_IMAGE"""
+    rows = iter(rows)
+    total = 0
+    while True:
+        buf = io.BytesIO()
+        buf.write(b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0))
+        n = 0
+        for spid, storage_uri, embedding in rows:
+            buf.write(struct.pack(">h", 3))
+            buf.write(_binary_text(spid))
+            buf.write(_binary_text(storage_uri))
+            buf.write(_binary_vector(embedding))
+            n += 1
+            if n == CHUNK_ROWS:
+                break
+        if not n:
+            return total
+        buf.write(struct.pack(">h", -1))
+        buf.seek(0)
+        cursor.copy_expert("COPY FACE_IMAGE (SPID, storage_uri, embedding) FROM STDIN WITH (FORMAT binary)", buf)
+        total += n
+
+
+def random_unit_embeddings(rng, n):
+    """n random L2-normalized float32 vectors, like ArcFace output"""
+    vectors = rng.standard_normal((n, EMBEDDING_SIZE), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+# ---------- Synthetic data ----------
+
+def generate_ceremonies(count, start):
+    colleges = list(COLLEGES)
+    ceremonies, degrees = [], []
+    for i in range(count):
+        college = colleges[i % len(colleges)]
+        day = start + timedelta(days=i // len(colleges))
+        hour = 10 if (i // len(colleges)) % 2 == 0 else 14
+        begin = day.replace(hour=hour, minute=0, second=0)
+        ceremonies.append((
+            i + 1,
+            f"{day:%B %Y} College of {college} Ceremony {i + 1}",
+            begin,
+            "Lane Stadium" if i % 2 == 0 else "Cassell Coliseum",
+            begin.time(),
+            (begin + timedelta(hours=2)).time(),
+        ))
+    # each college's degrees go round-robin to that college's ceremonies
+    for c, college in enumerate(colleges):
+        ids = [i + 1 for i in range(count) if i % len(colleges) == c]
+        if not ids:
+            continue
+        for d, degree in enumerate(COLLEGES[college]):
+            degrees.append((degree, ids[d % len(ids)]))
+    return ceremonies, degrees
+
+
+def generate_students(rnd, count, degrees, opt_in_rate):
+    degree_names = [d[0] for d in degrees]
+    for i in range(1, count + 1):
+        first = rnd.choice(FIRST_NAMES)
+        last = rnd.choice(LAST_NAMES)
+        yield (
+            f"S{i:07d}",
+            f"{first} {last}",
+            f"{first[0]}{last}{i}@vt.edu".lower(),
+            rnd.choice(degree_names),
+            rnd.choices(*DEGREE_TYPES)[0],
+            rnd.random() < opt_in_rate,
+        )
+
+
+def load(students, ceremonies, opt_in_rate, queued_rate, seed, reset):
+    rnd = random.Random(seed)
+    rng = np.random.default_rng(seed)
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    start = time.perf_counter()
+
+    if reset:
+        cursor.execute("TRUNCATE QUEUED, MANAGES, FACE_IMAGE, STUDENT, STAFF, DEGREE, CEREMONY RESTART IDENTITY CASCADE")
+    else:
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM CEREMONY) OR EXISTS (SELECT 1 FROM STUDENT)")
+        if cursor.fetchone()[0]:
+            raise SystemExit("Database already has data; rerun with --reset to replace it")
+
+    # Building the ANN index once after the load is far cheaper than maintaining it per row,
+    # and per-row queue notifications are pointless with nobody listening for this data
+    cursor.execute(f"DROP INDEX IF EXISTS {FACE_INDEX_NAME}")
+    cursor.execute("ALTER TABLE QUEUED DISABLE TRIGGER queued_notify")
+
+    ceremony_rows, degree_rows = generate_ceremonies(ceremonies, datetime(2026, 5, 14))
+    copy_rows(cursor, "CEREMONY", ["ceremony_id", "name", "date_time", "location", "start_time", "end_time"], ceremony_rows)
+    cursor.execute("SELECT setval(pg_get_serial_sequence('ceremony', 'ceremony_id'), %s)", (ceremonies,))
+    copy_rows(cursor, "DEGREE", ["degree_name", "ceremony_id"], degree_rows)
+    print(f"✓ {len(ceremony_rows)} ceremonies, {len(degree_rows)} degrees")
+
+    student_rows = list(generate_students(rnd, students, degree_rows, opt_in_rate))
+    copy_rows(cursor, "STUDENT", ["PID", "name", "email", "degree_name", "degree_type", "opt_in_biometric"], student_rows)
+    print(f"✓ {len(student_rows)} students ({time.perf_counter() - start:.1f}s)")
+
+    opted_in = [s[0] for s in student_rows if s[5]]
+
+    def face_rows():
+        for offset in range(0, len(opted_in), CHUNK_ROWS):
+            pids = opted_in[offset:offset + CHUNK_ROWS]
+            for pid, embedding in zip(pids, random_unit_embeddings(rng, len(pids))):
+                yield pid, f"synthetic/{pid}.jpg", embedding
+
+    faces = copy_face_images(cursor, face_rows())
+    print(f"✓ {faces} face images ({time.perf_counter() - start:.1f}s)")
+
+    staff_rows = [
+        (f"STAFF{i:04d}", f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}", f"staff{i}@vt.edu", "active")
+        for i in range(1, max(students // 200, ceremonies) + 1)
+    ]
+    copy_rows(cursor, "STAFF", ["staff_id", "name", "email", "status"], staff_rows)
+    manages_rows = []
+    for ceremony_id, *_ in ceremony_rows:
+        for role, staff in zip(["Coordinator", "Assistant"], rnd.sample(staff_rows, min(2, len(staff_rows)))):
+            manages_rows.append((staff[0], ceremony_id, role))
+    copy_rows(cursor, "MANAGES", ["staff_id", "ceremony_id", "role"], manages_rows)
+    print(f"✓ {len(staff_rows)} staff, {len(manages_rows)} assignments")
+
+    ceremony_of = dict(degree_rows)
+    starts = {c[0]: c[2] for c in ceremony_rows}
+
+    def queued_rows():
+        for pid, _, _, degree_name, _, _ in student_rows:
+            if rnd.random() < queued_rate:
+                ceremony_id = ceremony_of[degree_name]
+                queued_at = starts[ceremony_id] - timedelta(seconds=rnd.randint(0, 3600))
+                yield pid, ceremony_id, queued_at, rnd.choices(*QUEUE_STATUSES)[0]
+
+    queued = copy_rows(cursor, "QUEUED", ["SPID", "ceremony_id", "time_queued", "status"], queued_rows())
+    print(f"✓ {queued} queue entries ({time.perf_counter() - start:.1f}s)")
+
+    cursor.execute("ALTER TABLE QUEUED ENABLE TRIGGER queued_notify")
+    create_vector_index(cursor, method=FACE_INDEX_METHOD)
+    cursor.execute("SELECT to_regclass('report_summary') IS NOT NULL")
+    if cursor.fetchone()[0]:
+        cursor.execute("REFRESH MATERIALIZED VIEW report_summary")
+    conn.commit()
+
+    # ANALYZE outside the load transaction so the planner sees the new row counts
+    conn.autocommit = True
+    for table in ["CEREMONY", "DEGREE", "STUDENT", "FACE_IMAGE", "STAFF", "MANAGES", "QUEUED"]:
+        cursor.execute(f"ANALYZE {table}")
+    cursor.close()
+    conn.close()
+    print(f"\n✓ Synthetic dataset loaded in {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load a synthetic dataset with COPY")
+    parser.add_argument("--students", type=int, default=1000, help="e.g. 1000, 10000, 100000")
+    parser.add_argument("--ceremonies", type=int, default=4)
+    parser.add_argument("--opt-in", type=float, default=0.8, help="fraction of students with a face embedding")
+    parser.add_argument("--queued", type=float, default=0.3, help="fraction of students in a ceremony queue")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="truncate the existing data first")
+    args = parser.parse_args()
+
+    load(args.students, args.ceremonies, args.opt_in, args.queued, args.seed, args.reset)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 from createDB import *  
+from loadSynthetic import copy_rows, copy_face_images
 import random
 import pickle  
 
@@ -21,10 +22,7 @@ def insert_sample_data():
             ('Fall 2025 College of Arts Ceremony', '2025-12-18 14:00:00', 'Cassell Coliseum', '14:00:00', '16:00:00'),
         ]
         
-        cursor.executemany("""
-            INSERT INTO CEREMONY (name, date_time, location, start_time, end_time)
-            VALUES (%s, %s, %s, %s, %s)
-        """, ceremonies)
+        copy_rows(cursor, "CEREMONY", ["name", "date_time", "location", "start_time", "end_time"], ceremonies)
         print(f"✓ Inserted {len(ceremonies)} ceremonies.")
 
         degrees = [
@@ -69,10 +67,7 @@ def insert_sample_data():
             ('Music', 4),
         ]
 
-        cursor.executemany("""
-            INSERT INTO DEGREE (degree_name, ceremony_id)
-            VALUES (%s, %s)
-        """, degrees)
+        copy_rows(cursor, "DEGREE", ["degree_name", "ceremony_id"], degrees)
         print(f"✓ Inserted {len(degrees)} degrees.")
 
         
@@ -102,10 +97,7 @@ def insert_sample_data():
             ('PID022', 'Rachel Walker', 'rwalker@vt.edu', 'Physics', 'MS', True),
         ]
         
-        cursor.executemany("""
-            INSERT INTO STUDENT (PID, name, email, degree_name, degree_type, opt_in_biometric)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, students)
+        copy_rows(cursor, "STUDENT", ["PID", "name", "email", "degree_name", "degree_type", "opt_in_biometric"], students)
         print(f"✓ Inserted {len(students)} students.")
         
         
@@ -119,10 +111,7 @@ def insert_sample_data():
             ('STAFF005', 'Prof. James Wilson', 'jwilson@vt.edu', 'active'),
         ]
         
-        cursor.executemany("""
-            INSERT INTO STAFF (staff_id, name, email, status)
-            VALUES (%s, %s, %s, %s)
-        """, staff)
+        copy_rows(cursor, "STAFF", ["staff_id", "name", "email", "status"], staff)
         print(f"✓ Inserted {len(staff)} staff members.")
         
         # Insert FACE_IMAGES (for students who opted in)
@@ -159,10 +148,7 @@ def insert_sample_data():
             for (pid, path), emb in zip(face_images_no_emb, loaded_embeddings)
         ]
 
-        cursor.executemany("""
-            INSERT INTO FACE_IMAGE (SPID, storage_uri, embedding)
-            VALUES (%s, %s, %s)
-        """, face_images)
+        copy_face_images(cursor, face_images)
         print(f"✓ Inserted {len(face_images)} face images.")
         
         # Insert MANAGES relationships
@@ -175,10 +161,7 @@ def insert_sample_data():
             ('STAFF001', 4, 'Assistant'),
         ]
         
-        cursor.executemany("""
-            INSERT INTO MANAGES (staff_id, ceremony_id, role)
-            VALUES (%s, %s, %s)
-        """, manages)
+        copy_rows(cursor, "MANAGES", ["staff_id", "ceremony_id", "role"], manages)
         print(f"✓ Inserted {len(manages)} staff-ceremony assignments.")
         
         # Insert QUEUED relationships (students registered for ceremonies)
@@ -207,10 +190,7 @@ def insert_sample_data():
             ('PID022', 2, '2025-05-15 13:52:00', 'pending'),
         ]
         
-        cursor.executemany("""
-            INSERT INTO QUEUED (SPID, ceremony_id, time_queued, status)
-            VALUES (%s, %s, %s, %s)
-        """, queued)
+        copy_rows(cursor, "QUEUED", ["SPID", "ceremony_id", "time_queued", "status"], queued)
         print(f"✓ Inserted {len(queued)} student queue records.")
         
         conn.commit()
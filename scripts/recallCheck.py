@@ -0,0 +1,148 @@
+import argparse
+import json
+import time
+
+import numpy as np
+from pgvector.psycopg2 import register_vector
+
+from createDB import psycopg2, DB_CONFIG, FACE_INDEX_NAME
+from app.face.gallery import EmbeddingRows, _normalize, _parse_vector
+from app.face.search import FACE_RERANK_CANDIDATES, apply_search_params, nearest_faces_sql, search_params
+
+'''
+Measures top-k recall of the compact embedding options against an exact float32
+search over the same FACE_IMAGE rows, and how much memory / index they take
+
+    python scripts/recallCheck.py --queries 200 --k 5
+    python scripts/recallCheck.py --ef-search 100 --json recall.json
+
+Queries are enrolled embeddings plus Gaussian noise (--noise), standing in for
+a new capture of an enrolled graduate. Checked:
+  gallery float32 / float16 / int8, with and without the full-precision rerank
+  pgvector "vector" and "halfvec" queries (the app's match SQL); each only uses
+  the ANN index when it matches the one built (scripts/vectorIndex.py --precision)
+'''
+
+DTYPES = ["float32", "float16", "int8"]
+
+
+def load_faces(cursor):
+    cursor.execute("SELECT face_id, embedding::text FROM FACE_IMAGE ORDER BY face_id")
+    rows = cursor.fetchall()
+    face_ids = np.array([r[0] for r in rows], dtype=np.int64)
+    matrix = np.empty((len(rows), 512), dtype=np.float32)
+    for i, r in enumerate(rows):
+        matrix[i] = _parse_vector(r[1])
+    return face_ids, _normalize(matrix)
+
+
+def top_k(sims, k):
+    k = min(k, sims.shape[1])
+    top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(sims, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1)
+
+
+def recall(found, truth):
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def check_gallery(matrix, face_ids, queries, truth, k, rerank):
+    results = []
+    for dtype in DTYPES:
+        rows = EmbeddingRows.quantize(matrix, dtype)
+        start = time.perf_counter()
+        approx = rows.similarities(queries)
+        found = top_k(approx, k)
+        seconds = time.perf_counter() - start
+        results.append({
+            "method": f"gallery {dtype}",
+            "bytes": rows.nbytes,
+            f"recall@{k}": recall(face_ids[found], truth),
+            "ms_per_query": round(1000 * seconds / len(queries), 3),
+        })
+        if dtype == "float32":
+            continue
+        # what the match route does: rerank the approximate candidates at full precision
+        candidates = top_k(approx, max(rerank, k))
+        exact = np.einsum("qd,qcd->qc", queries, matrix[candidates])
+        reranked = np.take_along_axis(candidates, top_k(exact, k), axis=1)
+        results.append({
+            "method": f"gallery {dtype} + rerank {rerank}",
+            "bytes": rows.nbytes,
+            f"recall@{k}": recall(face_ids[reranked], truth),
+        })
+    return results
+
+
+def check_database(cursor, queries, truth, k, ef_search):
+    cursor.execute("SELECT indexdef FROM pg_indexes WHERE indexname = %s", (FACE_INDEX_NAME,))
+    row = cursor.fetchone()
+    built = None if row is None else ("halfvec" if "halfvec" in row[0] else "vector")
+    cursor.execute("SELECT pg_relation_size(to_regclass(%s))", (FACE_INDEX_NAME,))
+    index_bytes = cursor.fetchone()[0]
+
+    results = []
+    for precision in ["vector", "halfvec"]:
+        sql = nearest_faces_sql("%(embedding)s::vector", precision=precision)
+        found = []
+        start = time.perf_counter()
+        for query in queries:
+            apply_search_params(cursor, ef_search=ef_search)
+            cursor.execute(sql, search_params(None, k, embedding=query))
+            found.append([r[0] for r in cursor.fetchall()])
+        seconds = time.perf_counter() - start
+        cursor.connection.commit()
+        results.append({
+            "method": f"pgvector {precision}" + ("" if built == precision else " (no matching index, exact scan)"),
+            "bytes": index_bytes if built == precision else None,
+            f"recall@{k}": recall(found, truth),
+            "ms_per_query": round(1000 * seconds / len(queries), 3),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall of halfvec / float16 / int8 search against float32")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--noise", type=float, default=0.02, help="per-dimension stddev added to each query")
+    parser.add_argument("--rerank", type=int, default=FACE_RERANK_CANDIDATES, help="candidates reranked at full precision")
+    parser.add_argument("--ef-search", type=int, default=None, help="hnsw.ef_search for the pgvector queries")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-db", action="store_true", help="only check the in-memory gallery")
+    parser.add_argument("--json", default=None, help="also write the results here")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    register_vector(conn)
+    cursor = conn.cursor()
+    face_ids, matrix = load_faces(cursor)
+    conn.commit()
+    if len(face_ids) < args.k:
+        raise SystemExit(f"Need at least {args.k} faces in FACE_IMAGE (try scripts/loadSynthetic.py)")
+
+    rng = np.random.default_rng(args.seed)
+    picks = rng.choice(len(face_ids), size=min(args.queries, len(face_ids)), replace=False)
+    queries = _normalize(matrix[picks] + rng.normal(0, args.noise, (len(picks), matrix.shape[1])).astype(np.float32))
+    truth = face_ids[top_k(queries @ matrix.T, args.k)]
+
+    results = check_gallery(matrix, face_ids, queries, truth, args.k, args.rerank)
+    if not args.skip_db:
+        results += check_database(cursor, queries, truth, args.k, args.ef_search)
+    cursor.close()
+    conn.close()
+
+    print(f"{len(face_ids)} faces, {len(queries)} queries, exact float32 top-{args.k} as ground truth\n")
+    for r in results:
+        size = f"{r['bytes'] / 1024 / 1024:8.2f} MB" if r["bytes"] is not None else "       - MB"
+        latency = f"{r['ms_per_query']:8.3f} ms/query" if "ms_per_query" in r else ""
+        print(f"{r['method']:<52} {size}  recall@{args.k} {r[f'recall@{args.k}']:.4f}  {latency}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"faces": len(face_ids), "queries": len(queries), "k": args.k, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import argparse
+import time
+
+from createDB import psycopg2, DB_CONFIG
+from app.report_data import REPORT_SUMMARY_VIEW, create_report_summary, refresh_report_summary
+
+'''
+Creates or refreshes the report_summary materialized view read by the reports
+API when REPORT_REFRESH_MODE is on_read, interval or manual
+
+    python scripts/reportSummary.py              # refresh (schedule this for "manual")
+    python scripts/reportSummary.py --create     # (re)create it, e.g. on an older database
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create or refresh the report_summary materialized view")
+    parser.add_argument("--create", action="store_true", help="drop and recreate the view")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    start = time.perf_counter()
+
+    if args.create:
+        create_report_summary(cursor)
+        conn.commit()
+        print(f"✓ {REPORT_SUMMARY_VIEW} created in {time.perf_counter() - start:.2f}s")
+    elif refresh_report_summary(conn):
+        print(f"✓ {REPORT_SUMMARY_VIEW} refreshed in {time.perf_counter() - start:.2f}s")
+    else:
+        print(f"{REPORT_SUMMARY_VIEW} is already being refreshed by another process")
+
+    cursor.close()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
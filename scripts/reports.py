@@ -1,9 +1,14 @@
 import os
+import sys
 import json
 import csv
 import psycopg2
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.report_data import fetch_report_dataset
+
 # ---------- Paths ----------
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -50,125 +55,15 @@ def save_csv(headers, rows, filename, folder=REPORTS_DIR):
     print(f"Saved CSV: {csv_path}")
 
 
-# ---------- Data fetch functions ----------
+# ---------- Data fetch ----------
 
-def get_students_per_degree():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT degree_name, COUNT(*) AS num_students
-        FROM STUDENT
-        GROUP BY degree_name
-        ORDER BY num_students DESC;
-    """)
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-
-    labels, values, cleaned_rows = [], [], []
-    for degree_name, count in rows:
-        label = degree_name if degree_name is not None else "Unknown"
-        labels.append(label)
-        values.append(count)
-        cleaned_rows.append([label, count])
-    return labels, values, cleaned_rows
-
-
-def get_queued_status_breakdown():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT status, COUNT(*) AS num_entries
-        FROM QUEUED
-        GROUP BY status
-        ORDER BY num_entries DESC;
-    """)
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-
-    labels, values, cleaned_rows = [], [], []
-    for status, count in rows:
-        label = status if status is not None else "Unknown"
-        labels.append(label)
-        values.append(count)
-        cleaned_rows.append([label, count])
-    return labels, values, cleaned_rows
-
-
-def get_students_per_degree_type():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT degree_type, COUNT(*) AS num_students
-        FROM STUDENT
-        GROUP BY degree_type
-        ORDER BY num_students DESC;
-    """)
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-
-    labels, values, cleaned_rows = [], [], []
-    for degree_type, count in rows:
-        label = degree_type if degree_type is not None else "Unknown"
-        labels.append(label)
-        values.append(count)
-        cleaned_rows.append([label, count])
-    return labels, values, cleaned_rows
-
-
-def get_biometric_opt_in_breakdown():
+def get_report_dataset():
+    """Every breakdown and distribution below, from one query (app/report_data.py)."""
     conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT opt_in_biometric, COUNT(*) AS num_students
-        FROM STUDENT
-        GROUP BY opt_in_biometric
-        ORDER BY num_students DESC;
-    """)
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-
-    labels, values, cleaned_rows = [], [], []
-    for opt_in, count in rows:
-        if opt_in is True:
-            label = "Opt-in"
-        elif opt_in is False:
-            label = "Not Opt-in"
-        else:
-            label = "Unknown"
-        labels.append(label)
-        values.append(count)
-        cleaned_rows.append([label, count])
-    return labels, values, cleaned_rows
-
-
-def get_students_per_ceremony():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT
-            C.name AS ceremony_name,
-            COUNT(S.PID) AS num_students
-        FROM CEREMONY C
-        LEFT JOIN DEGREE D ON D.ceremony_id = C.ceremony_id
-        LEFT JOIN STUDENT S ON S.degree_name = D.degree_name
-        GROUP BY C.name
-        ORDER BY num_students DESC;
-    """)
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-
-    labels, values, cleaned_rows = [], [], []
-    for ceremony_name, count in rows:
-        label = ceremony_name if ceremony_name is not None else "Unknown"
-        labels.append(label)
-        values.append(count)
-        cleaned_rows.append([label, count])
-    return labels, values, cleaned_rows
+    try:
+        return fetch_report_dataset(conn)
+    finally:
+        conn.close()
 
 
 # ---------- Ceremony type mapping ----------
@@ -232,25 +127,20 @@ def make_pie_chart(labels, values, title, legend_title, filename, folder=REPORTS
 
 # ---------- Managerial aggregate reports + charts ----------
 
-def build_managerial_reports():
+def build_managerial_reports(dataset):
     """
     Build a CSV with high-level aggregate statistics
     and create bar charts for managers under reports/managerial_reports. [web:99][web:155][web:168]
     """
-    conn = get_connection()
-    cur = conn.cursor()
+    overall = dataset["overall"]
+    dist = dataset["distributions"]
+    total_students = overall["total_students"]
+    total_opt_in = overall["total_opt_in"]
+    total_not_opt_in = overall["total_not_opt_in"]
 
     rows = []
 
     # 1) Overall student counts and biometric opt-in
-    cur.execute("""
-        SELECT
-            COUNT(*) AS total_students,
-            SUM(CASE WHEN opt_in_biometric = TRUE THEN 1 ELSE 0 END) AS total_opt_in,
-            SUM(CASE WHEN opt_in_biometric = FALSE THEN 1 ELSE 0 END) AS total_not_opt_in
-        FROM STUDENT;
-    """)
-    total_students, total_opt_in, total_not_opt_in = cur.fetchone()
     rows.append([
         "Overall Students and Opt-In",
         "COUNT, SUM",
@@ -261,116 +151,29 @@ def build_managerial_reports():
         ""
     ])
 
-    # 2) Min/avg/max number of students per degree
-    cur.execute("""
-        SELECT
-            MIN(num_students),
-            MAX(num_students),
-            AVG(num_students),
-            COUNT(*),
-            SUM(num_students)
-        FROM (
-            SELECT degree_name, COUNT(*) AS num_students
-            FROM STUDENT
-            GROUP BY degree_name
-        ) t;
-    """)
-    min_deg, max_deg, avg_deg, count_deg_groups, sum_deg = cur.fetchone()
-    rows.append([
-        "Students per Degree (distribution)",
-        "MIN, MAX, AVG, COUNT, SUM of grouped counts",
-        count_deg_groups,
-        min_deg,
-        max_deg,
-        avg_deg,
-        sum_deg,
-        "", "", ""
-    ])
-
-    # 3) Min/avg/max number of students per ceremony
-    cur.execute("""
-        SELECT
-            MIN(num_students),
-            MAX(num_students),
-            AVG(num_students),
-            COUNT(*),
-            SUM(num_students)
-        FROM (
-            SELECT
-                C.ceremony_id,
-                COUNT(S.PID) AS num_students
-            FROM CEREMONY C
-            LEFT JOIN DEGREE D ON D.ceremony_id = C.ceremony_id
-            LEFT JOIN STUDENT S ON S.degree_name = D.degree_name
-            GROUP BY C.ceremony_id
-        ) t;
-    """)
-    min_cer, max_cer, avg_cer, count_cer_groups, sum_cer = cur.fetchone()
-    rows.append([
-        "Students per Ceremony (distribution)",
-        "MIN, MAX, AVG, COUNT, SUM of grouped counts",
-        count_cer_groups,
-        min_cer,
-        max_cer,
-        avg_cer,
-        sum_cer,
-        "", "", ""
-    ])
-
-    # 4) Min/avg/max number of students per degree type
-    cur.execute("""
-        SELECT
-            MIN(num_students),
-            MAX(num_students),
-            AVG(num_students),
-            COUNT(*),
-            SUM(num_students)
-        FROM (
-            SELECT degree_type, COUNT(*) AS num_students
-            FROM STUDENT
-            GROUP BY degree_type
-        ) t;
-    """)
-    min_dtype, max_dtype, avg_dtype, count_dtype_groups, sum_dtype = cur.fetchone()
-    rows.append([
-        "Students per Degree Type (distribution)",
-        "MIN, MAX, AVG, COUNT, SUM of grouped counts",
-        count_dtype_groups,
-        min_dtype,
-        max_dtype,
-        avg_dtype,
-        sum_dtype,
-        "", "", ""
-    ])
-
-    # 5) Min/avg/max queued entries per ceremony
-    cur.execute("""
-        SELECT
-            MIN(num_entries),
-            MAX(num_entries),
-            AVG(num_entries),
-            COUNT(*),
-            SUM(num_entries)
-        FROM (
-            SELECT ceremony_id, COUNT(*) AS num_entries
-            FROM QUEUED
-            GROUP BY ceremony_id
-        ) t;
-    """)
-    min_q, max_q, avg_q, count_q_groups, sum_q = cur.fetchone()
-    rows.append([
-        "Queued Entries per Ceremony (distribution)",
-        "MIN, MAX, AVG, COUNT, SUM of grouped counts",
-        count_q_groups,
-        min_q,
-        max_q,
-        avg_q,
-        sum_q,
-        "", "", ""
-    ])
-
-    cur.close()
-    conn.close()
+    # 2-5) Min/max/avg/count/sum of the grouped counts
+    for report_name, key in [
+        ("Students per Degree (distribution)", "students_per_degree"),
+        ("Students per Ceremony (distribution)", "students_per_ceremony"),
+        ("Students per Degree Type (distribution)", "students_per_degree_type"),
+        ("Queued Entries per Ceremony (distribution)", "queued_per_ceremony"),
+    ]:
+        d = dist[key]
+        rows.append([
+            report_name,
+            "MIN, MAX, AVG, COUNT, SUM of grouped counts",
+            d["count"],
+            d["min"],
+            d["max"],
+            d["avg"],
+            d["sum"],
+            "", "", ""
+        ])
+
+    min_deg, avg_deg, max_deg = (dist["students_per_degree"][k] for k in ("min", "avg", "max"))
+    min_cer, avg_cer, max_cer = (dist["students_per_ceremony"][k] for k in ("min", "avg", "max"))
+    min_dtype, avg_dtype, max_dtype = (dist["students_per_degree_type"][k] for k in ("min", "avg", "max"))
+    min_q, avg_q, max_q = (dist["queued_per_ceremony"][k] for k in ("min", "avg", "max"))
 
     # Save managerial CSV
     headers = [
@@ -472,8 +275,10 @@ def build_managerial_reports():
 # ---------- Entry point ----------
 
 def main():
+    dataset = get_report_dataset()
+
     # 1) Students per degree
-    degree_labels, degree_values, degree_rows = get_students_per_degree()
+    degree_labels, degree_values, degree_rows = dataset["students_per_degree"]
     save_csv(
         headers=["degree_name", "num_students"],
         rows=degree_rows,
@@ -488,7 +293,7 @@ def main():
     )
 
     # 2) QUEUED status breakdown
-    status_labels, status_values, status_rows = get_queued_status_breakdown()
+    status_labels, status_values, status_rows = dataset["queued_status"]
     save_csv(
         headers=["status", "num_entries"],
         rows=status_rows,
@@ -503,7 +308,7 @@ def main():
     )
 
     # 3) Students per degree type
-    dtype_labels, dtype_values, dtype_rows = get_students_per_degree_type()
+    dtype_labels, dtype_values, dtype_rows = dataset["students_per_degree_type"]
     save_csv(
         headers=["degree_type", "num_students"],
         rows=dtype_rows,
@@ -518,7 +323,7 @@ def main():
     )
 
     # 4) Biometric opt-in vs not
-    bio_labels, bio_values, bio_rows = get_biometric_opt_in_breakdown()
+    bio_labels, bio_values, bio_rows = dataset["biometric_opt_in"]
     save_csv(
         headers=["opt_in_status", "num_students"],
         rows=bio_rows,
@@ -533,7 +338,7 @@ def main():
     )
 
     # 5) Students per ceremony (BUS/ENG/SCI/ART labels)
-    cer_labels, cer_values, cer_rows = get_students_per_ceremony()
+    cer_labels, cer_values, cer_rows = dataset["students_per_ceremony"]
     save_csv(
         headers=["ceremony_name", "num_students"],
         rows=cer_rows,
@@ -576,7 +381,7 @@ def main():
         print("No data found for chart: Students per Ceremony")
 
     # Managerial aggregate statistics + charts
-    build_managerial_reports()
+    build_managerial_reports(dataset)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,58 @@
+import argparse
+import time
+
+from createDB import psycopg2, DB_CONFIG, FACE_INDEX_METHOD, FACE_INDEX_NAME, FACE_INDEX_PRECISION, create_vector_index
+
+'''
+Rebuilds the FACE_IMAGE embedding index
+
+    python scripts/vectorIndex.py                      # method from FACE_INDEX_METHOD
+    python scripts/vectorIndex.py --method ivfflat --lists 50
+    python scripts/vectorIndex.py --precision halfvec  # half-size index over the same rows
+
+The new index is built with CREATE INDEX CONCURRENTLY next to the old one and
+swapped in when done, so matches keep running (the build itself takes longer).
+--offline drops and rebuilds in one transaction instead: faster, but every
+match blocks until it commits, so only use it during downtime.
+
+After switching precision, restart the API with the matching FACE_INDEX_PRECISION
+and compare recall with scripts/recallCheck.py.
+'''
+
+
+def rebuild_index(method, lists=None, precision=None, offline=False):
+    """Recreate the embedding index, then refresh planner statistics"""
+    conn = psycopg2.connect(**DB_CONFIG)
+    # CREATE / DROP INDEX CONCURRENTLY can't run inside a transaction block
+    conn.autocommit = not offline
+    cursor = conn.cursor()
+    start = time.perf_counter()
+
+    create_vector_index(cursor, method=method, lists=lists, precision=precision, concurrently=not offline)
+    cursor.execute("ANALYZE FACE_IMAGE;")
+    cursor.execute("SELECT pg_size_pretty(pg_relation_size(to_regclass(%s)))", (FACE_INDEX_NAME,))
+    size = cursor.fetchone()[0]
+    if offline:
+        conn.commit()
+
+    cursor.close()
+    conn.close()
+    print(f"✓ Index rebuilt in {time.perf_counter() - start:.2f}s ({size or 'no index'})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the FACE_IMAGE embedding index")
+    parser.add_argument("--method", choices=["hnsw", "ivfflat", "none"], default=FACE_INDEX_METHOD)
+    parser.add_argument("--lists", type=int, default=None, help="IVFFlat list count (default: rows / 1000)")
+    parser.add_argument("--precision", choices=["vector", "halfvec"], default=FACE_INDEX_PRECISION)
+    parser.add_argument(
+        "--offline", action="store_true",
+        help="rebuild in one transaction; locks FACE_IMAGE (all matches) until done, needs downtime",
+    )
+    args = parser.parse_args()
+
+    rebuild_index(args.method, args.lists, args.precision, args.offline)
+
+
+if __name__ == "__main__":
+    main()